@@ -0,0 +1,165 @@
+"""
+Grafici della pagina principale (semicerchio ore, barre ricavi/costi) a ogni
+rerun, con gli stessi valori e con valori cambiati:
+
+- legacy: figure ricostruite da zero (go.Pie + px.bar), versione precedente
+- charts: figura di base costruita una volta, poi patch in place
+  (cached_figure; nessun lavoro se gli input non cambiano)
+
+Misura il tempo per rerun (costruzione + serializzazione come in
+st.plotly_chart) e i byte della specifica JSON inviata al browser.
+
+Uso: python bench/bench_charts.py [rerun]
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import charts  # noqa: E402
+
+
+def legacy_figures(used_week_hours, available_hours, ricavi, costi):
+    """Versione precedente: le due figure costruite da zero."""
+    used = min(used_week_hours, available_hours)
+    remaining = max(available_hours - used, 0.0)
+
+    # Semicerchio ottenuto con pie: colori nella metà superiore (rosso = usate, blu = rimanenti)
+    # costruiamo values in modo che la fetta trasparente occupi la metà inferiore
+    # per l'effetto semicerchio disponiamo i valori in ordine e ruotiamo di 180°
+    fig_semi = go.Figure(
+        go.Pie(
+            values=[remaining, used],
+            hole=0.6,
+            sort=False,
+            direction="clockwise",
+            marker=dict(
+                colors=[
+                    "rgba(0,0,0,0)",  # filler (meta' inferiore invisibile)
+                    "#EF553B",  # rosso: ore usate
+                    # "#636EFA",  # blu: ore rimanenti
+                ],
+                line=dict(color="white", width=1),
+            ),
+            textinfo="none",
+            hoverinfo="value",
+            rotation=0,
+        )
+    )
+
+    pct = (used / available_hours * 100) if available_hours > 0 else 0.0
+    fig_semi.update_layout(
+        title="🕒 Utilizzo ore sede",
+        title_x=0.35,
+        showlegend=False,
+        margin=dict(t=30, b=0, l=0, r=0),
+        height=300,
+        annotations=[
+            dict(
+                text=f"<b>{used:.1f} / {available_hours:.1f} h</b><br><span style='font-size:12px'>usate / disponibili</span>",
+                x=0.5,
+                y=0.52,
+                showarrow=False,
+            ),
+            dict(
+                text=f"{pct:.1f}%",
+                x=0.5,
+                y=0.36,
+                showarrow=False,
+                font=dict(size=16),
+            ),
+        ],
+    )
+
+    # Grafico a barre: Ricavi vs Costi
+    df_bar = pd.DataFrame(
+        {"Categoria": ["Ricavi totali", "Costi totali"], "Valore": [ricavi, costi]}
+    )
+    fig_bar = px.bar(df_bar, x="Categoria", y="Valore", text="Valore", height=360)
+    fig_bar.update_traces(
+        texttemplate="€ %{y:,.2f}",
+        textposition="outside",
+        marker_color=["#00CC96", "#636EFA"],
+    )
+    fig_bar.update_layout(
+        title="💹 Confronto Ricavi e Costi",
+        title_x=0.35,
+        margin=dict(t=30, b=30, l=20, r=20),
+        yaxis_title="€",
+        xaxis_title="",
+        showlegend=False,
+    )
+    max_val = max(ricavi, costi)
+    fig_bar.update_yaxes(tickformat=",", range=[0, max_val + 5000])
+
+    return fig_semi, fig_bar
+
+
+def charts_figures(store, used_week_hours, available_hours, ricavi, costi):
+    fig_semi = charts.cached_figure(
+        store,
+        "fig_semi",
+        charts.hours_base_figure,
+        charts.patch_hours_figure,
+        used_week_hours,
+        available_hours,
+    )
+    fig_bar = charts.cached_figure(
+        store,
+        "fig_bar",
+        charts.revenue_cost_base_figure,
+        charts.patch_revenue_cost_figure,
+        ricavi,
+        costi,
+    )
+    return fig_semi, fig_bar
+
+
+def serialize(figures):
+    """Specifiche JSON come in st.plotly_chart (to_dict + to_json)."""
+    return [pio.to_json(fig.to_dict(), validate=False) for fig in figures]
+
+
+def timed(inputs, build):
+    times, specs = [], None
+    for values in inputs:
+        t0 = time.perf_counter()
+        specs = serialize(build(*values))
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000, sum(len(s) for s in specs)
+
+
+def main():
+    reruns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    same = [(86.0, 150.0, 18_100.0, 20_640.0)] * reruns
+    changing = [(80.0 + i % 20, 150.0, 18_000.0 + i, 20_640.0) for i in range(reruns)]
+
+    # stessi valori, testi e scala nelle due versioni
+    (old_semi, old_bar), (semi, bar) = legacy_figures(*same[0]), charts_figures(
+        {}, *same[0]
+    )
+    assert list(old_semi.data[0].values) == list(semi.data[0].values)
+    assert old_semi.layout.annotations == semi.layout.annotations
+    assert list(old_bar.data[0].y) == list(bar.data[0].y)
+    assert old_bar.layout.yaxis.range == bar.layout.yaxis.range
+
+    print(f"{reruns} rerun, mediana per rerun (due figure)")
+    print(f"{'metodo':<28}{'input':<12}{'ms':>8}{'byte':>10}")
+    for label, inputs in (("uguali", same), ("cambiati", changing)):
+        ms, size = timed(inputs, legacy_figures)
+        print(f"{'legacy':<28}{label:<12}{ms:>8.2f}{size:>10,}")
+        store = {}
+        ms, size = timed(inputs, lambda *v: charts_figures(store, *v))
+        print(f"{'charts (cached + patch)':<28}{label:<12}{ms:>8.2f}{size:>10,}")
+
+
+if __name__ == "__main__":
+    main()
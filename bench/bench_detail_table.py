@@ -0,0 +1,216 @@
+"""
+Tabella di dettaglio per corso su un catalogo grande (centinaia di corsi,
+migliaia di righe).
+
+- legacy: la versione precedente (df.apply riga per riga per filtro ed
+  etichette, euro formattati in stringhe con map)
+- tables.detail_table_frame: categorie, lookup per categoria, maschere
+  booleane; le colonne in euro restano numeriche e le formatta il widget
+
+Il confronto include, per la versione vettoriale, anche la formattazione
+degli euro (vettoriale) fatta solo per verificare che le tabelle coincidano.
+
+Uso: python bench/bench_detail_table.py [righe] [corsi] [ripetizioni]
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import engine  # noqa: E402
+import tables  # noqa: E402
+
+
+def random_rows(n_rows, n_courses, rng):
+    """DetailRows con n_courses varianti di corso (più quelle reali e gli speciali)."""
+    keys = np.array(
+        [k for k, _ in engine.courses]
+        + list(engine.SPECIAL_KEYS)
+        + [f"corso_{i:03d}" for i in range(n_courses)]
+    )
+    revenue = rng.uniform(0, 5_000, n_rows).round(2)
+    cost = rng.uniform(0, 5_000, n_rows)
+    rows = engine.DetailRows(
+        course_label=keys[rng.integers(0, len(keys), n_rows)].tolist(),
+        duration_min=rng.choice(engine.DURATIONS, n_rows).tolist(),
+        n_students=rng.integers(0, 30, n_rows).tolist(),
+        price_per_10_lezioni=rng.uniform(50, 300, n_rows).round(2).tolist(),
+        revenue_for_package=revenue.tolist(),
+    )
+    rows.set_costs(cost.tolist())
+    return rows
+
+
+def legacy_detail_table_frame(detail_rows):
+    """Versione precedente di tables.detail_table_frame (df.apply riga per riga)."""
+    df = pd.DataFrame(detail_rows.columns())
+
+    if df.empty:
+        return None, "Nessun corso con iscritti."
+
+    # ------------------------------------------------
+    # 0) Filtra/Nascondi i corsi che non vuoi mostrare
+    # accetta sia le chiavi brevi (prop, svil, fasce, solo_solfeggio)
+    # sia le label estese che potresti avere nei detail_rows
+    # ------------------------------------------------
+    exclude_keys = {"prop", "svil", "fasce", "solo_solfeggio"}
+    exclude_labels = {
+        "Propedeutica",
+        "Propedeutica musicale",
+        "Sviluppo musicalità",
+        "Musica in fasce",
+        "Solo Solfeggio",
+        "Solo solfeggio",
+    }
+
+    # alcune versioni dei detail_rows potrebbero usare 'course_label' come chiave breve,
+    # altre la label estesa; gestiamo entrambe
+    def row_is_excluded(row):
+        lab = str(row.get("course_label", "")).strip()
+        # confronto diretto con chiavi brevi
+        if lab in exclude_keys:
+            return True
+        # confronto con label estese (casefold per robustezza)
+        if lab.casefold() in {x.casefold() for x in exclude_labels}:
+            return True
+        # alcune volte la chiave originale è in un campo diverso (es. 'course' o 'course_key')
+        if "course" in row and str(row.get("course", "")).strip() in exclude_keys:
+            return True
+        if (
+            "course_key" in row
+            and str(row.get("course_key", "")).strip() in exclude_keys
+        ):
+            return True
+        return False
+
+    # Applichiamo il filtro
+    df = df[~df.apply(row_is_excluded, axis=1)].reset_index(drop=True)
+
+    if df.empty:
+        return (
+            None,
+            "Dopo aver nascosto i corsi selezionati non ci sono righe da mostrare.",
+        )
+
+    # -----------------------------
+    # Mappatura nomi più leggibili
+    # -----------------------------
+    rename_map = {
+        "solo_fiato": "Fiati",
+        "fiato_solf": "Fiati + Solfeggio",
+        "solo_arco": "Archi",
+        "arco_solf": "Archi + Solfeggio",
+        "prop": "Propedeutica",
+        "svil": "Sviluppo musicalità",
+        "fasce": "Musica in fasce",
+        "solo_solfeggio": "Solo Solfeggio",
+    }
+
+    # normalizza nomi/colonne se necessario
+    if "course_label" not in df.columns and "course" in df.columns:
+        df = df.rename(columns={"course": "course_label"})
+    if "duration_min" not in df.columns and "duration" in df.columns:
+        df = df.rename(columns={"duration": "duration_min"})
+    if "n_students" not in df.columns and "iscritti" in df.columns:
+        df = df.rename(columns={"iscritti": "n_students"})
+    if "price_per_10_lezioni" not in df.columns and "price" in df.columns:
+        df = df.rename(columns={"price": "price_per_10_lezioni"})
+    if "revenue_for_package" not in df.columns and "ricavo" in df.columns:
+        df = df.rename(columns={"ricavo": "revenue_for_package"})
+
+    # applica la mappatura leggibile sulla label e aggiungi i minuti tra parentesi
+    def pretty_label(row):
+        base = row.get("course_label", "")
+        pretty = rename_map.get(base, base)
+        minutes = row.get("duration_min", None)
+        if minutes is not None and str(minutes).strip() != "":
+            try:
+                return f"{pretty} ({int(minutes)}')"
+            except Exception:
+                return f"{pretty} ({minutes})"
+        return pretty
+
+    df["course_label"] = df.apply(pretty_label, axis=1)
+
+    # costo docente e saldo per riga sono calcolati dal motore (engine.allocated_hours)
+    df["n_students"] = df["n_students"].fillna(0).astype(int)
+
+    # -----------------------------
+    # Formattazione colonna e rinomina colonne per display
+    # -----------------------------
+    df_display = df
+    for col in [
+        "revenue_for_package",
+        "price_per_10_lezioni",
+        "cost_per_package",
+        "saldo",
+    ]:
+        if col in df_display.columns:
+            df_display[col] = df_display[col].map(lambda x: f"€ {x:,.2f}")
+
+    # colonne da mostrare (ordinamento suggerito)
+    display_cols = [
+        "course_label",
+        "duration_min",
+        "n_students",
+        "price_per_10_lezioni",
+        "revenue_for_package",
+        "cost_per_package",
+        "saldo",
+    ]
+    display_cols = [c for c in display_cols if c in df_display.columns]
+
+    pretty_headers = {
+        "course_label": "Corso",
+        "duration_min": "Minuti",
+        "n_students": "Iscritti",
+        "price_per_10_lezioni": "Prezzo (€/pacchetto)",
+        "revenue_for_package": "Ricavo (€/pacchetto)",
+        "cost_per_package": "Costo (€/pacchetto)",
+        "saldo": "Saldo (€/pacchetto)",
+    }
+    df_display = df_display[display_cols].rename(columns=pretty_headers)
+    return df_display, None
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), result
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    n_courses = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    rows = random_rows(n_rows, n_courses, np.random.default_rng(0))
+
+    legacy_time, (legacy, _) = timed(lambda: legacy_detail_table_frame(rows), runs)
+    vec_time, (table, _) = timed(lambda: tables.detail_table_frame(rows), runs)
+
+    # stessa tabella una volta formattati gli euro come nella versione precedente
+    formatted = table.copy()
+    for col in tables.DETAIL_MONEY_COLUMNS:
+        formatted[col] = [f"€ {x:,.2f}" for x in formatted[col].tolist()]
+    pd.testing.assert_frame_equal(
+        formatted.astype(str), legacy.astype(str), check_dtype=False
+    )
+
+    print(f"{n_rows} righe, {n_courses} corsi, mediana su {runs} ripetizioni")
+    print(f"{'metodo':<32}{'ms':>10}")
+    print(f"{'legacy (df.apply)':<32}{legacy_time * 1000:>10.1f}")
+    print(f"{'tables.detail_table_frame':<32}{vec_time * 1000:>10.1f}")
+    print(f"accelerazione: {legacy_time / vec_time:.0f}x, righe mostrate: {len(table)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Tempo di import del motore di calcolo (engine.py) in un interprete pulito,
+come accade in ogni processo di un pool. Verifica anche che l'import non
+trascini Streamlit, gspread, pandas o numpy.
+
+Uso: python bench/bench_engine_import.py [ripetizioni]
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import engine
+elapsed = time.perf_counter() - t0
+heavy = [m for m in ("streamlit", "gspread", "pandas", "numpy") if m in sys.modules]
+print(json.dumps({"ms": elapsed * 1000, "heavy": heavy}))
+"""
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results.append(json.loads(out.stdout))
+
+    assert not any(r["heavy"] for r in results), results[0]["heavy"]
+    times = [r["ms"] for r in results]
+    print(f"import engine ({runs} interpreti puliti)")
+    print(
+        f"mediana {statistics.median(times):.2f} ms, "
+        f"min {min(times):.2f} ms, max {max(times):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
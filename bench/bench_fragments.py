@@ -0,0 +1,90 @@
+"""
+Rerun della pagina dopo la modifica di un prezzo (AppTest, dati finti):
+
+- pagina: il nuovo prezzo è scritto in st.session_state e lo script è
+  rieseguito per intero (come prima dei frammenti)
+- frammenti: il prezzo è cambiato dal widget; il callback aggiorna il modello
+  e rilancia solo i frammenti con nodi cambiati (main.FRAGMENT_NODES)
+
+Misura la mediana del tempo di rerun e quanti elementi sono ridisegnati.
+Prima dei frammenti (e delle sezioni di analisi calcolate solo se aperte)
+una modifica di prezzo costava quanto "pagina" più sensibilità, pareggio e
+prezzi suggeriti.
+
+Uso: python bench/bench_fragments.py [ripetizioni]
+"""
+
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+os.environ.setdefault("DATA_SOURCE", "fake")
+os.chdir(ROOT)
+
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest, local_script_runner  # noqa: E402
+
+# AppTest crea una ScriptCache nuova (e ricompila main.py) a ogni run; il
+# server ne usa una sola, quindi qui la condividiamo tra i run
+_script_cache = ScriptCache()
+local_script_runner.ScriptCache = lambda: _script_cache
+
+# prezzi modificati: una cella con iscritti (cambiano ricavi e totali) e una
+# senza iscritti (cambiano solo le righe di dettaglio e lo scenario)
+PRICE_KEYS = ("price_solo_fiato_30", "price_solo_arco_30")
+
+
+def elements(at):
+    # elementi disegnati nell'ultimo rerun (foglie dell'albero)
+    def count(node):
+        children = getattr(node, "children", None)
+        if not children:
+            return 1
+        return sum(count(child) for child in children.values())
+
+    return count(at.main) + count(at.sidebar)
+
+
+def measure(at, price_key, runs):
+    base_price = at.number_input(key=price_key).value
+    times = {"pagina": [], "frammenti": []}
+    drawn = {}
+    for i in range(runs):
+        # rerun completo: ripristina anche l'albero con tutti i widget
+        at.session_state[price_key] = base_price + 2 * i + 1
+        t0 = time.perf_counter()
+        at.run()
+        times["pagina"].append(time.perf_counter() - t0)
+        drawn["pagina"] = elements(at)
+
+        at.number_input(key=price_key).set_value(base_price + 2 * i + 2)
+        t0 = time.perf_counter()
+        at.run()
+        times["frammenti"].append(time.perf_counter() - t0)
+        drawn["frammenti"] = elements(at)
+        assert not at.exception, at.exception
+    # prezzo iniziale per la misura successiva
+    at.session_state[price_key] = base_price
+    at.run()
+    return times, drawn
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    at = AppTest.from_file(str(ROOT / "main.py"), default_timeout=120).run()
+
+    print(f"mediana su {runs} ripetizioni")
+    print(f"{'prezzo':<22}{'iscritti':>9}{'rerun':>12}{'ms':>10}{'elementi':>10}")
+    for price_key in PRICE_KEYS:
+        students = at.session_state[price_key.replace("price_", "iscr_", 1)]
+        times, drawn = measure(at, price_key, runs)
+        for name, values in times.items():
+            ms = statistics.median(values) * 1000
+            print(f"{price_key:<22}{students:>9}{name:>12}{ms:>10.1f}{drawn[name]:>10}")
+
+
+if __name__ == "__main__":
+    main()
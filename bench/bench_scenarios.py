@@ -0,0 +1,126 @@
+"""
+Valutazione in blocco di scenari "what if" (min_students, costo docente,
+prezzi dei corsi di fiato) a partire dai dati di esempio di sources.py.
+
+- ciclo Python: engine.compute_totals chiamato scenario per scenario
+- ciclo vettoriale: vector_engine.compute_totals_vec scenario per scenario
+  (deve restituire esattamente lo stesso dict di compute_totals)
+- vector_engine.evaluate_scenarios: tutti gli scenari in un solo passaggio
+
+Obiettivo: almeno 100.000 scenari/s su un singolo core.
+
+Uso: python bench/bench_scenarios.py [scenari] [ripetizioni]
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import engine  # noqa: E402
+import sources  # noqa: E402
+import vector_engine  # noqa: E402
+
+TARGET = 100_000
+
+
+def base_inputs():
+    """Input dell'app con i valori di esempio e i prezzi di PRICE_TABLE."""
+    enrolls = {
+        (d, k): sources.SAMPLE_ENROLLMENTS.get((d, k), 0)
+        for d in engine.DURATIONS
+        for k, _ in engine.courses
+    }
+    specials_data = {k: dict(v) for k, v in sources.SAMPLE_SPECIALS.items()}
+    specials = {k: v["students"] for k, v in specials_data.items()}
+    return enrolls, specials, specials_data
+
+
+def random_scenarios(n, rng):
+    """Array di n scenari: min_students 4-8, costo 20-30 €/h, fiato ±20%."""
+    enrolls, specials, specials_data = base_inputs()
+    batch = vector_engine.stack_scenarios(
+        [
+            {
+                "enrolls": enrolls,
+                "specials": specials,
+                "specials_data": specials_data,
+                "price_overrides": engine.PRICE_TABLE,
+            }
+        ]
+    )
+    fiato = np.array(["fiato" in k for k in vector_engine.COURSE_KEYS])
+    factor = rng.uniform(0.8, 1.2, size=n)
+    batch["prices"] = batch["prices"] * np.where(fiato, factor[:, None, None], 1.0)
+    batch["min_students"] = rng.integers(4, 9, size=n).astype(float)
+    batch["hourly_teacher_cost"] = rng.uniform(20.0, 30.0, size=n).round(1)
+    batch["contributi"] = 0.0
+    batch["costi_fissi"] = 0.0
+    batch["total_available_hours"] = 150.0
+    return batch
+
+
+def as_dicts(batch, i):
+    """Scenario i del blocco nel formato di compute_totals."""
+    enrolls, specials, specials_data = base_inputs()
+    prices = batch["prices"][i]
+    price_overrides = {
+        (d, k): float(prices[r, c])
+        for r, d in enumerate(engine.DURATIONS)
+        for c, k in enumerate(vector_engine.COURSE_KEYS)
+    }
+    return dict(
+        enrolls=enrolls,
+        specials=specials,
+        specials_data=specials_data,
+        price_overrides=price_overrides,
+        min_students=float(batch["min_students"][i]),
+        hourly_teacher_cost=float(batch["hourly_teacher_cost"][i]),
+        contributi=0.0,
+        costi_fissi=0.0,
+        total_available_hours=150.0,
+    )
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    batch = random_scenarios(n, np.random.default_rng(0))
+
+    # ciclo Python su un campione (il tempo per scenario è costante)
+    sample = [as_dicts(batch, i) for i in range(min(n, 2_000))]
+    t0 = time.perf_counter()
+    loop_results = [engine.compute_totals(**s) for s in sample]
+    loop_rate = len(sample) / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    vec_loop_results = [vector_engine.compute_totals_vec(**s) for s in sample]
+    vec_loop_rate = len(sample) / (time.perf_counter() - t0)
+
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        table = vector_engine.evaluate_scenarios(**batch)
+        times.append(time.perf_counter() - t0)
+    vec_rate = n / statistics.median(times)
+
+    for i, (totals, vec_totals) in enumerate(zip(loop_results, vec_loop_results)):
+        assert vec_totals == totals, (i, "compute_totals_vec")
+        for col in ("total_revenue", "total_costs", "deviation", "saturation"):
+            assert table[col].iat[i] == totals[col], (i, col)
+
+    print(f"{n} scenari, mediana su {runs} ripetizioni")
+    print(f"{'metodo':<32}{'scenari/s':>14}")
+    print(f"{'compute_totals (ciclo)':<32}{loop_rate:>14,.0f}")
+    print(f"{'compute_totals_vec (ciclo)':<32}{vec_loop_rate:>14,.0f}")
+    print(f"{'evaluate_scenarios':<32}{vec_rate:>14,.0f}")
+    print(f"obiettivo {TARGET:,}/s: {'raggiunto' if vec_rate >= TARGET else 'NO'}")
+    print(table.describe().loc[["min", "50%", "max"]].round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
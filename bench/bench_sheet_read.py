@@ -0,0 +1,190 @@
+"""
+Confronto lettura foglio intero (get_all_values + iloc/iterrows) contro
+lettura batch dei soli blocchi H2:J13 e L1:O5 con valori non formattati.
+
+Il foglio è sintetico: i due blocchi reali più tante righe/colonne di
+"altro contenuto", come accade nella scheda condivisa. I byte sono quelli
+del corpo JSON che l'API restituirebbe per ciascuna delle due richieste.
+
+Uso: python bench/bench_sheet_read.py [righe] [colonne]
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import sources  # noqa: E402
+
+ENROLLMENTS = [
+    (30, "solo_fiato", 1),
+    (30, "fiato_solf", 12),
+    (30, "solo_arco", 0),
+    (30, "arco_solf", 13),
+    (45, "solo_fiato", 9),
+    (45, "fiato_solf", 16),
+    (45, "solo_arco", 11),
+    (45, "arco_solf", 11),
+    (60, "solo_fiato", 8),
+    (60, "fiato_solf", 4),
+    (60, "solo_arco", 10),
+    (60, "arco_solf", 2),
+]
+SPECIALS = [
+    ("prop", 0, 60, 100),
+    ("svil", 5, 45, 80),
+    ("fasce", 0, 30, 80),
+    ("solo_solfeggio", 12, 60, 100),
+]
+
+
+def synthetic_grid(n_rows, n_cols):
+    """Foglio come lo restituisce get_all_values(): tutte stringhe formattate."""
+    grid = [[f"nota {r}-{c}" for c in range(n_cols)] for r in range(n_rows)]
+    r0, c0 = sources.ROWS[0], sources.COLS[0]
+    grid[r0 - 1][c0 : c0 + 3] = sources.COL_NAMES
+    for i, (d, corso, n) in enumerate(ENROLLMENTS):
+        grid[r0 + i][c0 : c0 + 3] = [str(d), corso, str(n)]
+    r0, c0 = sources.SPECIAL_ROWS[0], sources.SPECIAL_COLS[0]
+    grid[r0][c0 : c0 + 4] = sources.SPECIAL_COL_NAMES
+    for i, (corso, s, d, p) in enumerate(SPECIALS):
+        grid[r0 + 1 + i][c0 : c0 + 4] = [corso, str(s), str(d), f"{p:.2f}"]
+    return grid
+
+
+def batch_blocks():
+    """Blocchi come li restituisce batch_get(..., UNFORMATTED_VALUE)."""
+    enroll_block = [[d, corso, n] for d, corso, n in ENROLLMENTS]
+    special_block = [list(sources.SPECIAL_COL_NAMES)]
+    special_block += [[corso, s, d, p] for corso, s, d, p in SPECIALS]
+    return enroll_block, special_block
+
+
+# ----------------------------
+# percorso precedente (foglio intero)
+# ----------------------------
+def safe_int(x):
+    try:
+        if x is None:
+            return None
+        s = str(x).strip()
+        if s == "":
+            return None
+        return int(float(s))
+    except:
+        return None
+
+
+def safe_float(x):
+    try:
+        s = str(x).strip()
+        if s == "":
+            return None
+        return float(s)
+    except:
+        return None
+
+
+def parse_whole_sheet(values):
+    df = pd.DataFrame(values)
+    chunk = df.iloc[sources.ROWS[0] : sources.ROWS[1], sources.COLS[0] : sources.COLS[1]]
+    chunk = chunk.copy()
+    chunk.columns = sources.COL_NAMES[: chunk.shape[1]]
+    enrollments = {}
+    for _, r in chunk.iterrows():
+        d = safe_int(r.get("Durata"))
+        c = (r.get("Corso") or "").strip()
+        n = safe_int(r.get("Iscritti"))
+        if d is not None and c != "" and n is not None:
+            enrollments[(d, c)] = n
+
+    special_chunk = df.iloc[
+        sources.SPECIAL_ROWS[0] : sources.SPECIAL_ROWS[1],
+        sources.SPECIAL_COLS[0] : sources.SPECIAL_COLS[1],
+    ].copy()
+    special_chunk.columns = sources.SPECIAL_COL_NAMES[: special_chunk.shape[1]]
+    specials = {}
+    for _, r in special_chunk.iterrows():
+        corso = (r.get("Corso") or "").strip()
+        students = safe_int(r.get("Studenti"))
+        duration = safe_int(r.get("Durata")) or 60
+        price = safe_float(r.get("Prezzo")) or 100
+        if corso != "" and students is not None:
+            specials[corso] = {
+                "students": students,
+                "duration": duration,
+                "price": price,
+            }
+    return enrollments, specials
+
+
+def parse_batch(value_ranges):
+    enroll_block, special_block = (vr["values"] for vr in value_ranges)
+    return sources.parse_enrollments(enroll_block), sources.parse_specials(special_block)
+
+
+def timeit(fn, *args, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    whole_body = json.dumps(
+        {
+            "range": f"'{sources.SHEET_NAME}'!A1:{sources.col_letter(n_cols - 1)}{n_rows}",
+            "majorDimension": "ROWS",
+            "values": synthetic_grid(n_rows, n_cols),
+        }
+    )
+    enroll_block, special_block = batch_blocks()
+    batch_body = json.dumps(
+        {
+            "spreadsheetId": "x" * 44,
+            "valueRanges": [
+                {
+                    "range": sources.ENROLL_RANGE,
+                    "majorDimension": "ROWS",
+                    "values": enroll_block,
+                },
+                {
+                    "range": sources.SPECIAL_RANGE,
+                    "majorDimension": "ROWS",
+                    "values": special_block,
+                },
+            ],
+        }
+    )
+
+    old = parse_whole_sheet(json.loads(whole_body)["values"])
+    new = parse_batch(json.loads(batch_body)["valueRanges"])
+    assert old == new, "i due percorsi devono produrre gli stessi default"
+
+    t_old = timeit(lambda: parse_whole_sheet(json.loads(whole_body)["values"]))
+    t_new = timeit(lambda: parse_batch(json.loads(batch_body)["valueRanges"]))
+
+    print(f"Foglio sintetico: {n_rows} righe x {n_cols} colonne")
+    print(f"{'percorso':<28}{'byte':>12}{'parse (ms)':>14}")
+    print(f"{'foglio intero':<28}{len(whole_body):>12,}{t_old * 1000:>14.3f}")
+    print(
+        f"{'batch ' + sources.ENROLL_RANGE + ' + ' + sources.SPECIAL_RANGE:<28}"
+        f"{len(batch_body):>12,}{t_new * 1000:>14.3f}"
+    )
+    print(
+        f"riduzione byte: x{len(whole_body) / len(batch_body):,.0f}, "
+        f"parse: x{t_old / t_new:,.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Prova di carico: N sessioni che leggono i dati nello stesso istante
+(es. tutti aprono la dashboard a inizio riunione) contro un foglio finto
+con latenza simulata. Conta le letture effettive della sorgente.
+
+- senza coalescenza: ogni sessione chiama source.load()
+- con SheetCache: avvio a freddo (get) e "Aggiorna dal foglio" (refresh)
+  condividono un'unica lettura in corso
+- retry: una sorgente che risponde 429 due volte prima di riuscire
+
+Uso: python bench/bench_singleflight.py [sessioni] [latenza_s]
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import loader  # noqa: E402
+import sources  # noqa: E402
+
+
+def run_sessions(n, target):
+    """Avvia n thread che chiamano target() tutti insieme; restituisce la durata."""
+    barrier = threading.Barrier(n)
+    errors = []
+
+    def session():
+        barrier.wait()
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session) for _ in range(n)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors, errors
+    return time.perf_counter() - t0
+
+
+class QuotaError(Exception):
+    """Stessa forma di gspread.exceptions.APIError (response.status_code)."""
+
+    def __init__(self):
+        super().__init__("429 Quota exceeded")
+        self.response = type("Response", (), {"status_code": 429, "headers": {}})()
+
+
+class FlakySource(sources.FakeSheetSource):
+    """Risponde 429 alle prime `failures` letture."""
+
+    def __init__(self, failures, **kw):
+        super().__init__(**kw)
+        self.failures = failures
+
+    def fetch_blocks(self):
+        blocks = super().fetch_blocks()
+        if self.calls <= self.failures:
+            raise QuotaError()
+        return blocks
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    print(f"{n} sessioni concorrenti, latenza sorgente {latency * 1000:.0f} ms")
+    print(f"{'scenario':<40}{'letture':>10}{'tempo (s)':>12}")
+
+    source = sources.FakeSheetSource(latency=latency)
+    elapsed = run_sessions(n, source.load)
+    print(f"{'senza coalescenza':<40}{source.calls:>10}{elapsed:>12.2f}")
+
+    source = sources.FakeSheetSource(latency=latency)
+    cache = loader.SheetCache(source, ttl=600)
+    elapsed = run_sessions(n, cache.get)
+    print(f"{'SheetCache, avvio a freddo':<40}{source.calls:>10}{elapsed:>12.2f}")
+
+    calls_before = source.calls
+    elapsed = run_sessions(n, cache.refresh)
+    print(
+        f"{'SheetCache, refresh simultanei':<40}"
+        f"{source.calls - calls_before:>10}{elapsed:>12.2f}"
+    )
+
+    source = FlakySource(failures=2)
+    waits = []
+    result = sources.retry_call(source.load, sleep=waits.append)
+    assert result == sources.FakeSheetSource().load()
+    print(
+        f"retry su 429: {source.calls} tentativi, "
+        f"attese {', '.join(f'{w:.2f}s' for w in waits)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
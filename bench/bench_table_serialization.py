@@ -0,0 +1,59 @@
+"""
+Serializzazione della tabella di dettaglio verso il browser (come fa
+st.dataframe a ogni rerun), a parità di righe:
+
+- stringhe: euro formattati come "€ 1,234.00" (colonne object, versione precedente)
+- numpy: colonne numeriche float64/int64
+- arrow: tables.detail_table_frame (colonne pd.ArrowDtype)
+
+Misura byte inviati e tempo di conversione in Arrow IPC.
+
+Uso: python bench/bench_table_serialization.py [righe] [corsi] [ripetizioni]
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import tables  # noqa: E402
+from bench_detail_table import random_rows  # noqa: E402
+
+
+def variants(rows):
+    arrow, _ = tables.detail_table_frame(rows)
+    numeric = arrow.astype(
+        {col: str(dtype.numpy_dtype) for col, dtype in arrow.dtypes.items()}
+    )
+    formatted = numeric.copy()
+    for col in tables.DETAIL_MONEY_COLUMNS:
+        formatted[col] = [f"€ {x:,.2f}" for x in formatted[col].tolist()]
+    formatted = formatted.astype(object)
+    return {"stringhe": formatted, "numpy": numeric, "arrow": arrow}
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    n_courses = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    rows = random_rows(n_rows, n_courses, np.random.default_rng(0))
+
+    print(f"{n_rows} righe, {n_courses} corsi, mediana su {runs} ripetizioni")
+    print(f"{'tabella':<12}{'KB':>10}{'ms':>10}")
+    for name, df in variants(rows).items():
+        times = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            data = convert_anything_to_arrow_bytes(df)
+            times.append(time.perf_counter() - t0)
+        ms = statistics.median(times) * 1000
+        print(f"{name:<12}{len(data) / 1024:>10.1f}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Grafici della pagina principale: semicerchio delle ore e barre ricavi/costi.
+
+La figura di base (tracce, colori, layout, annotazioni) è costruita una sola
+volta; quando cambiano gli input si aggiornano in place solo i valori delle
+tracce, le annotazioni e l'asse, senza ricostruire la figura. cached_figure
+conserva figura e ultimi input (es. in st.session_state, una per sessione) e
+non tocca la figura se gli input sono gli stessi del rerun precedente.
+"""
+
+import plotly.graph_objects as go
+
+HOURS_COLORS = [
+    "rgba(0,0,0,0)",  # filler (meta' inferiore invisibile)
+    "#EF553B",  # rosso: ore usate
+]
+BAR_CATEGORIES = ["Ricavi totali", "Costi totali"]
+BAR_COLORS = ["#00CC96", "#636EFA"]
+# spazio sopra la barra più alta per l'etichetta in euro
+BAR_HEADROOM = 5000
+
+
+def cached_figure(store, name, build, patch, *values):
+    """
+    Figura `name` conservata in store (mapping): costruita con build() al
+    primo uso, poi aggiornata con patch(fig, *values) solo se values cambiano.
+    """
+    entry = store.get(name)
+    if entry is None:
+        entry = {"figure": build(), "values": None}
+        store[name] = entry
+    if entry["values"] != values:
+        patch(entry["figure"], *values)
+        entry["values"] = values
+    return entry["figure"]
+
+
+# ----------------------------
+# SEMICERCHIO ORE
+# ----------------------------
+def hours_base_figure():
+    """Semicerchio ottenuto con pie (ruotato); valori e testi da patch_hours_figure."""
+    fig = go.Figure(
+        go.Pie(
+            values=[1.0, 0.0],
+            hole=0.6,
+            sort=False,
+            direction="clockwise",
+            marker=dict(colors=HOURS_COLORS, line=dict(color="white", width=1)),
+            textinfo="none",
+            hoverinfo="value",
+            rotation=0,
+        )
+    )
+    fig.update_layout(
+        title="🕒 Utilizzo ore sede",
+        title_x=0.35,
+        showlegend=False,
+        margin=dict(t=30, b=0, l=0, r=0),
+        height=300,
+        annotations=[
+            dict(text="", x=0.5, y=0.52, showarrow=False),
+            dict(text="", x=0.5, y=0.36, showarrow=False, font=dict(size=16)),
+        ],
+    )
+    return fig
+
+
+def patch_hours_figure(fig, used_week_hours, available_hours):
+    used = min(used_week_hours, available_hours)
+    remaining = max(available_hours - used, 0.0)
+    pct = (used / available_hours * 100) if available_hours > 0 else 0.0
+    with fig.batch_update():
+        fig.data[0].values = [remaining, used]
+        fig.layout.annotations[0].text = (
+            f"<b>{used:.1f} / {available_hours:.1f} h</b>"
+            "<br><span style='font-size:12px'>usate / disponibili</span>"
+        )
+        fig.layout.annotations[1].text = f"{pct:.1f}%"
+
+
+# ----------------------------
+# BARRE RICAVI / COSTI
+# ----------------------------
+def revenue_cost_base_figure():
+    """Barre ricavi e costi totali; valori e scala da patch_revenue_cost_figure."""
+    fig = go.Figure(
+        go.Bar(
+            x=BAR_CATEGORIES,
+            y=[0.0, 0.0],
+            text=[0.0, 0.0],
+            texttemplate="€ %{y:,.2f}",
+            textposition="outside",
+            marker_color=BAR_COLORS,
+            showlegend=False,
+        )
+    )
+    fig.update_layout(
+        title="💹 Confronto Ricavi e Costi",
+        title_x=0.35,
+        height=360,
+        margin=dict(t=30, b=30, l=20, r=20),
+        yaxis_title="€",
+        xaxis_title="",
+        showlegend=False,
+    )
+    fig.update_yaxes(tickformat=",", range=[0, BAR_HEADROOM])
+    return fig
+
+
+def patch_revenue_cost_figure(fig, ricavi, costi):
+    with fig.batch_update():
+        fig.data[0].y = [ricavi, costi]
+        fig.data[0].text = [ricavi, costi]
+        fig.layout.yaxis.range = [0, max(ricavi, costi) + BAR_HEADROOM]
@@ -0,0 +1,356 @@
+"""Motore di calcolo: ricavi, ore, classi e costi della scuola di musica.
+
+Modulo senza Streamlit né gspread (solo libreria standard), importabile in un
+benchmark, in un job batch o in un pool di processi: l'import non fa I/O.
+"""
+
+from math import ceil
+
+# --- CORSI PRINCIPALI ---
+courses = [
+    ("solo_fiato", "Solo strumento a fiato"),
+    ("fiato_solf", "Strumento a fiato + solfeggio"),
+    ("solo_arco", "Solo strumento ad arco"),
+    ("arco_solf", "Strumento ad arco + solfeggio"),
+]
+
+PRICE_TABLE = {
+    (30, "solo_fiato"): 90.0,
+    (30, "fiato_solf"): 120.0,
+    (30, "solo_arco"): 110.0,
+    (30, "arco_solf"): 160.0,
+    (45, "solo_fiato"): 135.0,
+    (45, "fiato_solf"): 160.0,
+    (45, "solo_arco"): 165.0,
+    (45, "arco_solf"): 220.0,
+    (60, "solo_fiato"): 180.0,
+    (60, "fiato_solf"): 190.0,
+    (60, "solo_arco"): 220.0,
+    (60, "arco_solf"): 240.0,
+}
+DEFAULT_PRICES_BY_MIN = {30: 120.0, 45: 180.0, 60: 240.0}
+LESSONS_PER_PACKAGE = 10
+# pacchetti da 10 lezioni in un anno scolastico (proiezione annuale)
+PACKAGES_PER_YEAR = 3
+
+DURATIONS = (30, 45, 60)
+# corsi con lezione individuale di strumento
+INDIVIDUAL_COURSES = ("solo_fiato", "solo_arco", "fiato_solf", "arco_solf")
+# corsi che frequentano anche le classi di solfeggio
+SOLFEGGIO_COURSES = ("fiato_solf", "arco_solf")
+# corsi speciali: i primi tre sono classi a sé, solo_solfeggio va nelle classi da 60'
+SPECIAL_KEYS = ("prop", "svil", "fasce", "solo_solfeggio")
+GROUP_SPECIALS = ("prop", "svil", "fasce")
+SPECIAL_LABELS = {
+    "prop": "Propedeutica",
+    "svil": "Sviluppo musicalità",
+    "fasce": "Musica in fasce",
+    "solo_solfeggio": "Solo solfeggio",
+}
+
+
+# ----------------------------
+# RIGHE DI DETTAGLIO
+# ----------------------------
+# campi di una riga di dettaglio (ricavo per corso), nell'ordine di DetailRows.append
+DETAIL_FIELDS = (
+    "course_label",
+    "duration_min",
+    "n_students",
+    "price_per_10_lezioni",
+    "revenue_for_package",
+    "cost_per_package",
+    "saldo",
+)
+
+
+class DetailRows:
+    """
+    Righe di dettaglio per corso in forma colonnare: una lista per campo
+    (DETAIL_FIELDS) invece di un dict per riga. columns() va passato
+    direttamente a pandas/Arrow (pd.DataFrame(rows.columns())).
+    Le righe si aggiungono con i ricavi; costi e saldo arrivano con set_costs()
+    quando le classi sono note.
+    """
+
+    __slots__ = DETAIL_FIELDS
+
+    def __init__(self, **columns):
+        for field in DETAIL_FIELDS:
+            setattr(self, field, list(columns.get(field, ())))
+
+    def append(self, course_label, duration_min, n_students, price, revenue):
+        self.course_label.append(course_label)
+        self.duration_min.append(duration_min)
+        self.n_students.append(n_students)
+        self.price_per_10_lezioni.append(price)
+        self.revenue_for_package.append(revenue)
+
+    def set_costs(self, costs):
+        """Costo docente per riga (stesso ordine delle righe) e saldo = ricavo - costo."""
+        self.cost_per_package = list(costs)
+        self.saldo = [
+            revenue - cost
+            for revenue, cost in zip(self.revenue_for_package, self.cost_per_package)
+        ]
+
+    def columns(self):
+        """{campo: lista di valori} nell'ordine di DETAIL_FIELDS."""
+        return {field: getattr(self, field) for field in DETAIL_FIELDS}
+
+    def __len__(self):
+        return len(self.course_label)
+
+    def __eq__(self, other):
+        if not isinstance(other, DetailRows):
+            return NotImplemented
+        return self.columns() == other.columns()
+
+    def __repr__(self):
+        return f"DetailRows({len(self)} righe)"
+
+
+# ----------------------------
+# READ
+# ----------------------------
+def read_enrollments(enrollment_keys, specials_data, state):
+    """
+    enrollment_keys: {(durata, corso): chiave}; state: mapping chiave → valore
+    (es. st.session_state). Restituisce (enrolls, specials).
+    """
+    enrolls = {
+        (duration, key): int(state.get(session_key, 0))
+        for (duration, key), session_key in enrollment_keys.items()
+    }
+    specials = {k: v["students"] for k, v in specials_data.items()}
+    return enrolls, specials
+
+
+# ----------------------------
+# CLASSI
+# ----------------------------
+def class_count(students, min_students):
+    """Numero di classi necessarie: ceil(studenti / minimo per classe)."""
+    return ceil(students / min_students) if students > 0 else 0
+
+
+def solfeggio_students_by_duration(enrolls, specials):
+    """
+    Allievi di solfeggio per durata (fiato_solf + arco_solf);
+    i solo_solfeggio sono aggiunti al gruppo da 60 minuti.
+    """
+    students_by_duration = {}
+    for d in DURATIONS:
+        students = sum(int(enrolls.get((d, k), 0)) for k in SOLFEGGIO_COURSES)
+        if d == 60:
+            students += int(specials.get("solo_solfeggio", 0))
+        students_by_duration[d] = students
+    return students_by_duration
+
+
+def allocated_hours(
+    key,
+    duration,
+    n_students,
+    solfeggio_students,
+    solfeggio_class_count,
+    group_class_count,
+    num_lessons,
+):
+    """
+    Ore docente per pacchetto attribuite a una riga di dettaglio:
+    - lezioni individuali del corso;
+    - quota delle classi di solfeggio della sua durata (60' per solo_solfeggio),
+      divise in proporzione agli allievi del gruppo;
+    - per prop/svil/fasce, tutte le ore delle loro classi.
+    La somma sulle righe è total_hours (a meno degli arrotondamenti).
+    """
+    n_students = int(n_students)
+    hours = 0.0
+    if key in INDIVIDUAL_COURSES:
+        hours += n_students * (duration / 60.0) * num_lessons
+    if key in SOLFEGGIO_COURSES or key == "solo_solfeggio":
+        group = 60 if key == "solo_solfeggio" else duration
+        if solfeggio_students[group] > 0:
+            hours += (
+                solfeggio_class_count[group]
+                * 1.0
+                * num_lessons
+                * n_students
+                / solfeggio_students[group]
+            )
+    if key in GROUP_SPECIALS:
+        hours += group_class_count[key] * (duration / 60.0) * num_lessons
+    return hours
+
+
+# ----------------------------
+# CALC
+# ----------------------------
+def annual_result(total_revenue, total_costs, contributi, costi_fissi):
+    """Risultato netto dell'anno: PACKAGES_PER_YEAR pacchetti + contributi - costi fissi."""
+    return (
+        PACKAGES_PER_YEAR * total_revenue
+        - PACKAGES_PER_YEAR * total_costs
+        + contributi
+        - costi_fissi
+    )
+
+
+def compute_totals(
+    enrolls,
+    specials,
+    specials_data,
+    price_overrides,
+    min_students,
+    hourly_teacher_cost,
+    contributi,
+    costi_fissi,
+    total_available_hours,
+    num_lessons=LESSONS_PER_PACKAGE,
+    defaults_specials=None,
+):
+    """
+    Restituisce i totali per un pacchetto di num_lessons:
+    - ricavi, ore (pacchetto e settimanali), costi (docente + solfeggio), deviazione
+    - solfeggio raggruppato per durata (30/45/60): studenti e classi
+    - classi di prop/svil/fasce e ore settimanali effettive per componente
+    - righe di dettaglio per corso: ricavo, costo docente attribuito (allocated_hours) e saldo
+    defaults_specials fornisce prezzo/durata dei corsi speciali assenti da specials_data.
+    """
+    defaults_specials = defaults_specials or {}
+    total_revenue = 0.0
+    detail_rows = DetailRows()
+
+    # RICAVI corsi principali
+    for (duration, key), n_students in enrolls.items():
+        price = price_overrides.get((duration, key), DEFAULT_PRICES_BY_MIN[duration])
+        revenue = n_students * price * (num_lessons / LESSONS_PER_PACKAGE)
+        total_revenue += revenue
+        detail_rows.append(key, duration, n_students, price, revenue)
+
+    # RICAVI speciali (uso specials_data per price/duration)
+    for k, n_students in specials.items():
+        if n_students <= 0:
+            continue
+        meta = specials_data.get(k, {})
+        price = meta.get("price", defaults_specials.get(k, {}).get("price", 0.0))
+        duration = meta.get(
+            "duration", defaults_specials.get(k, {}).get("duration", 60)
+        )
+        revenue = n_students * price * (num_lessons / LESSONS_PER_PACKAGE)
+        total_revenue += revenue
+        detail_rows.append(k, duration, n_students, price, revenue)
+
+    # aggiungo contributi (se presenti) ai ricavi netti
+    # total_revenue += float(contributi or 0.0)
+
+    # Ore per pacchetto (moltiplicate per num_lessons)
+    individual_hours = sum(
+        int(n) * (duration / 60.0) * num_lessons
+        for (duration, key), n in enrolls.items()
+        if key in INDIVIDUAL_COURSES
+    )
+
+    # Solfeggio: sommo studenti per durata (fiato_solf + arco_solf),
+    # aggiungo i solo_solfeggio al gruppo 60 e poi calcolo classi (ceil once)
+    solfeggio_students = solfeggio_students_by_duration(enrolls, specials)
+    solfeggio_class_count = {
+        d: class_count(students, min_students)
+        for d, students in solfeggio_students.items()
+    }
+
+    # ogni classe di solfeggio dura 1 ora, moltiplichiamo per num_lessons
+    solfeggio_class_hours = sum(
+        count * 1.0 * num_lessons for count in solfeggio_class_count.values()
+    )
+
+    # Altri corsi in classe: prop, svil, fasce (durata presa da specials_data)
+    other_class_hours = 0.0
+    weekly_other_class_hours = 0.0
+    group_class_count = {}
+    for k in GROUP_SPECIALS:
+        n_students = int(specials.get(k, 0))
+        group_class_count[k] = class_count(n_students, min_students)
+        if n_students > 0:
+            duration = specials_data.get(k, {}).get(
+                "duration", defaults_specials.get(k, {}).get("duration", 60)
+            )
+            other_class_hours += group_class_count[k] * (duration / 60.0) * num_lessons
+            weekly_other_class_hours += group_class_count[k] * (duration / 60.0)
+
+    # Ore settimanali effettive: max 1 lezione di strumento e 1 di solfeggio a settimana
+    weekly_individual_hours = sum(
+        int(n) * (duration / 60.0)
+        for (duration, key), n in enrolls.items()
+        if key in INDIVIDUAL_COURSES
+    )
+    weekly_solfeggio_hours = sum(
+        count * 1.0 for count in solfeggio_class_count.values()
+    )
+    weekly_total_hours = (
+        weekly_individual_hours + weekly_solfeggio_hours + weekly_other_class_hours
+    )
+
+    total_hours = individual_hours + solfeggio_class_hours + other_class_hours
+    total_week_hours = (
+        total_hours / LESSONS_PER_PACKAGE if LESSONS_PER_PACKAGE else total_hours
+    )
+
+    # COSTI
+    individual_costs = hourly_teacher_cost * individual_hours
+    special_costs = hourly_teacher_cost * other_class_hours
+    teacher_cost = hourly_teacher_cost * (individual_hours + other_class_hours)
+    solf_cost = hourly_teacher_cost * solfeggio_class_hours
+    total_costs = teacher_cost + solf_cost  # + other_fixed_costs
+    deviation = total_revenue - total_costs
+
+    saturation = (
+        (total_week_hours / total_available_hours) * 100
+        if total_available_hours > 0
+        else 0.0
+    )
+
+    # COSTI PER RIGA: ore docente attribuite a ogni corso
+    detail_rows.set_costs(
+        hourly_teacher_cost
+        * allocated_hours(
+            key,
+            duration,
+            n_students,
+            solfeggio_students,
+            solfeggio_class_count,
+            group_class_count,
+            num_lessons,
+        )
+        for key, duration, n_students in zip(
+            detail_rows.course_label, detail_rows.duration_min, detail_rows.n_students
+        )
+    )
+
+    return {
+        "total_revenue": total_revenue,
+        "total_hours": total_hours,
+        "total_week_hours": total_week_hours,
+        "saturation": saturation,
+        "individual_costs": individual_costs,
+        "special_costs": special_costs,
+        "solfeggio_cost": solf_cost,
+        "total_costs": total_costs,
+        "deviation": deviation,
+        "detail_rows": detail_rows,
+        "solfeggio_class_count_by_duration": solfeggio_class_count,
+        # dettaglio per pacchetto
+        "individual_hours": individual_hours,
+        "solfeggio_class_hours": solfeggio_class_hours,
+        "other_class_hours": other_class_hours,
+        "teacher_cost": teacher_cost,
+        # classi
+        "solfeggio_students_by_duration": solfeggio_students,
+        "group_class_count": group_class_count,
+        # settimanali
+        "weekly_individual_hours": weekly_individual_hours,
+        "weekly_solfeggio_hours": weekly_solfeggio_hours,
+        "weekly_other_class_hours": weekly_other_class_hours,
+        "weekly_total_hours": weekly_total_hours,
+    }
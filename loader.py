@@ -0,0 +1,253 @@
+"""Caricamento dei valori di default (iscritti e corsi speciali) per l'app.
+
+La lettura della sorgente dati (di norma il foglio Google) è la parte più lenta
+di ogni rerun: i blocchi già interpretati vengono quindi tenuti in cache
+(condivisa tra rerun e sessioni) e, dopo CACHE_TTL secondi, riletti in
+background mentre l'app continua a mostrare i dati precedenti.
+
+La sorgente si sceglie da .env con DATA_SOURCE (google | csv | xlsx | sqlite | fake)
+e, per i file locali, DATA_SOURCE_PATH.
+"""
+
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from sources import blocks_fingerprint, make_source, parse_blocks
+
+load_dotenv()  # carica tutte le variabili da .env
+
+# Durata della cache (secondi): dopo questo tempo il foglio viene riletto
+CACHE_TTL = int(os.getenv("SHEET_CACHE_TTL", "600"))
+DATA_SOURCE = os.getenv("DATA_SOURCE", "google")
+DATA_SOURCE_PATH = os.getenv("DATA_SOURCE_PATH")
+# Copia locale dell'ultima lettura riuscita (vuoto = disattivata)
+SNAPSHOT_PATH = os.getenv("SHEET_SNAPSHOT_PATH", ".cache/sheet_snapshot.json")
+SNAPSHOT_FORMAT = 3
+
+_cache_lock = threading.Lock()
+
+
+# ----------------------------
+# SINGLE-FLIGHT
+# ----------------------------
+class SingleFlight:
+    """
+    Chiamate concorrenti con la stessa chiave condividono un'unica esecuzione:
+    la prima esegue fn(), le altre attendono e ricevono lo stesso risultato
+    (o la stessa eccezione).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+# letture in corso nel processo, per sorgente (foglio + intervalli)
+_flight = SingleFlight()
+
+
+# ----------------------------
+# COPIA LOCALE (avvio a freddo)
+# ----------------------------
+def save_snapshot(path, source_key, snapshot):
+    """Scrive lo snapshot in JSON compatto (scrittura atomica: file temporaneo + rename)."""
+    data = {
+        "format": SNAPSHOT_FORMAT,
+        "source": list(source_key),
+        "fetched_at": snapshot["fetched_at"],
+        "enrollments": [
+            [d, c, n] for (d, c), n in snapshot["default_enrollments"].items()
+        ],
+        "specials": snapshot["defaults_specials"],
+        "rejected": snapshot["rejected"],
+        "fingerprint": snapshot["fingerprint"],
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, source_key):
+    """
+    Legge lo snapshot salvato; None se manca, è illeggibile, ha un formato
+    diverso o proviene da un'altra sorgente.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data["format"] != SNAPSHOT_FORMAT or data["source"] != list(source_key):
+            return None
+        return {
+            "default_enrollments": {(d, c): n for d, c, n in data["enrollments"]},
+            "defaults_specials": data["specials"],
+            "rejected": data["rejected"],
+            "fingerprint": data["fingerprint"],
+            "fetched_at": data["fetched_at"],
+            "version": 1,
+            "from_disk": True,
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+# ----------------------------
+# CACHE (stale-while-revalidate)
+# ----------------------------
+class SheetCache:
+    """
+    Ultima lettura valida della sorgente, condivisa da tutte le sessioni.
+
+    get() restituisce sempre subito lo snapshot corrente; se è più vecchio di
+    ttl secondi avvia una rilettura in un thread in background, che a lettura
+    completata sostituisce lo snapshot in blocco (nuovo dict, version + 1).
+    Se l'impronta delle celle lette non è cambiata la rilettura non interpreta
+    nulla e lascia invariati version e dati: aggiorna solo fetched_at.
+
+    Con snapshot_path ogni lettura riuscita viene salvata su disco e ricaricata
+    all'avvio: la prima pagina usa subito la copia locale (anche se l'API non
+    risponde) mentre la sorgente viene riletta in background. Solo senza copia
+    locale la primissima lettura è bloccante.
+    """
+
+    def __init__(self, source, ttl=CACHE_TTL, snapshot_path=None):
+        self.source = source
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.last_error = None
+        self._snapshot = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        if snapshot_path:
+            self._snapshot = load_snapshot(snapshot_path, source.key())
+        self._revalidate = self._snapshot is not None
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.refresh()
+        if self._revalidate or cache_age(snapshot["fetched_at"]) > self.ttl:
+            self._revalidate = False
+            self.refresh_async()
+        return snapshot
+
+    def refresh(self):
+        """
+        Rilegge la sorgente (bloccante) e pubblica il nuovo snapshot.
+        Se una lettura della stessa sorgente è già in corso, ne attende l'esito
+        invece di avviarne un'altra.
+        """
+        return _flight.do(self.source.key(), self._load)
+
+    def _load(self):
+        blocks = self.source.fetch_blocks()
+        fingerprint = blocks_fingerprint(*blocks)
+        with self._lock:
+            current = self._snapshot
+        if current is not None and current.get("fingerprint") == fingerprint:
+            # contenuto identico: niente parsing, stessa versione e stessi oggetti
+            # (i risultati già calcolati a valle restano validi)
+            with self._lock:
+                self._snapshot = dict(current, fetched_at=time.time(), from_disk=False)
+                self.last_error = None
+                return self._snapshot
+
+        default_enrollments, defaults_specials, rejected = parse_blocks(*blocks)
+        with self._lock:
+            version = self._snapshot["version"] + 1 if self._snapshot else 1
+            self._snapshot = {
+                "default_enrollments": default_enrollments,
+                "defaults_specials": defaults_specials,
+                "rejected": rejected,
+                "fingerprint": fingerprint,
+                "fetched_at": time.time(),
+                "version": version,
+            }
+            self.last_error = None
+            snapshot = self._snapshot
+        if self.snapshot_path:
+            try:
+                save_snapshot(self.snapshot_path, self.source.key(), snapshot)
+            except OSError as e:
+                # la copia locale è solo un'ottimizzazione: non blocco l'app
+                self.last_error = e
+        return snapshot
+
+    def refresh_async(self):
+        """Avvia una rilettura in background (se non ce n'è già una in corso)."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(
+            target=self._background_refresh, name="sheet-refresh", daemon=True
+        ).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # continuo a servire l'ultimo snapshot valido
+            self.last_error = e
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+_cache = None
+
+
+def get_cache():
+    """Cache del processo, legata alla sorgente configurata in .env."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SheetCache(
+                make_source(DATA_SOURCE, DATA_SOURCE_PATH),
+                snapshot_path=SNAPSHOT_PATH or None,
+            )
+        return _cache
+
+
+def load_defaults():
+    """
+    Snapshot corrente: {default_enrollments, defaults_specials, rejected,
+    fingerprint, fetched_at, version}. version cambia solo se cambiano i dati.
+    Non attende mai la rete, tranne alla primissima lettura del processo.
+    """
+    return get_cache().get()
+
+
+def cache_age(fetched_at):
+    """Secondi trascorsi dall'ultima lettura del foglio."""
+    return max(time.time() - fetched_at, 0.0)
@@ -1,128 +1,36 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
 import numpy as np
-from math import ceil
-import os, json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from dotenv import load_dotenv
 
-load_dotenv()  # carica tutte le variabili da .env
-
-
-# CREDS_PATH = os.getenv("CREDS_PATH")
-SPREADSHEET_NAME = os.getenv("SPREADSHEET_NAME")
-SHEET_NAME = os.getenv("SHEET_NAME")
-ROWS = (1, 13)  # zero-based: start inclusive, end exclusive (es. righe 2-13)
-COLS = (7, 10)  # zero-based: colonne H-J (start inclusive, end exclusive)
-COL_NAMES = ["Durata", "Corso", "Iscritti"]
-# ----------------------------
-# CONNESSIONE A FOGLI GOOGLE
-# ----------------------------
-
-# Connessione e lettura
-scope = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive",
-]
-
-
-# Provo a leggere il JSON dai secrets/cloud
-creds_json = os.getenv("GOOGLE_CREDS_JSON")
-
-if creds_json:
-    # Se esiste, siamo in cloud
-    creds_dict = json.loads(creds_json)
-    creds_dict["private_key"] = creds_dict["private_key"].replace("\\n", "\n")
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-else:
-    # Se non esiste, siamo in locale: carico dal file fisico
-    CREDS_PATH = "credenziali.json"
-    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDS_PATH, scope)
-# creds = ServiceAccountCredentials.from_json_keyfile_name(CREDS_PATH, scope)
-# creds_dict = json.loads(creds_json)
-# creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-client = gspread.authorize(creds)
-sheet = client.open(SPREADSHEET_NAME).worksheet(SHEET_NAME)
-values = sheet.get_all_values()
-df = pd.DataFrame(values)
-
-# Estraggo la porzione indicata
-chunk = df.iloc[ROWS[0] : ROWS[1], COLS[0] : COLS[1]].copy()
-chunk.columns = COL_NAMES[: chunk.shape[1]]
-
-
-def safe_int(x):
-    try:
-        if x is None:
-            return None
-        s = str(x).strip()
-        if s == "":
-            return None
-        return int(float(s))
-    except:
-        return None
-
-
-# Costruisco default_enrollments con chiavi tuple
-default_enrollments = {}
-for _, r in chunk.iterrows():
-    d = safe_int(r.get("Durata"))
-    c = (r.get("Corso") or "").strip()
-    n = safe_int(r.get("Iscritti"))
-    if d is not None and c != "" and n is not None:
-        default_enrollments[(d, c)] = n
-
-
-#################################SPECIALS#############################################
-# ----------------------------
-# COORDINATE per specials dal .env o fisse
-# ----------------------------
-SPECIAL_ROWS = (0, 5)  # righe 1-5 nel foglio → 0-based
-SPECIAL_COLS = (11, 15)  # colonne L-O → 0-based
-
-# Nomi colonne
-SPECIAL_COL_NAMES = ["Corso", "Studenti", "Durata", "Prezzo"]
-
-# Estraggo la porzione
-special_chunk = df.iloc[
-    SPECIAL_ROWS[0] : SPECIAL_ROWS[1], SPECIAL_COLS[0] : SPECIAL_COLS[1]
-].copy()
-special_chunk.columns = SPECIAL_COL_NAMES[: special_chunk.shape[1]]
-
-
-# Funzione safe int già definita
-def safe_float(x):
-    try:
-        s = str(x).strip()
-        if s == "":
-            return None
-        return float(s)
-    except:
-        return None
-
-
-# Costruisco defaults_specials
-defaults_specials = {}
-for _, r in special_chunk.iterrows():
-    corso = (r.get("Corso") or "").strip()
-    students = safe_int(r.get("Studenti"))
-    duration = safe_int(r.get("Durata")) or 60  # default se vuoi
-    price = safe_float(r.get("Prezzo")) or 100  # default se vuoi
-
-    if corso != "" and students is not None:
-        defaults_specials[corso] = {
-            "students": students,
-            "duration": duration,
-            "price": price,
-        }
-
-
-# ----------------------------
-# FINE CONNESSIONE
-# ----------------------------
+from charts import (
+    cached_figure,
+    hours_base_figure,
+    patch_hours_figure,
+    patch_revenue_cost_figure,
+    revenue_cost_base_figure,
+)
+from engine import (
+    DEFAULT_PRICES_BY_MIN,
+    DURATIONS,
+    GROUP_SPECIALS,
+    LESSONS_PER_PACKAGE,
+    PACKAGES_PER_YEAR,
+    PRICE_TABLE,
+    SPECIAL_KEYS,
+    SPECIAL_LABELS,
+    annual_result,
+    courses,
+    read_enrollments,
+)
+from loader import CACHE_TTL, cache_age, get_cache, load_defaults
+from memo import canonical_key, memo_stats, memoized
+from model_graph import build_totals_graph, graph_inputs
+from montecarlo import run_monte_carlo
+from optimizer import optimize_prices
+from solver import break_even_price, break_even_students
+from tables import DETAIL_MONEY_COLUMNS, class_summary_frame, detail_table_frame
+from vector_engine import parameter_grid, scenario_fingerprint, stack_scenarios
 
 # st.code("default_enrollments = " + repr(defaults_specials), language="python")
 # ----------------------------
@@ -143,75 +51,6 @@ Gli allievi che fanno *solo solfeggio* da 60 minuti vengono raggruppati con quel
 """
 )
 
-# --- CORSI PRINCIPALI ---
-courses = [
-    ("solo_fiato", "Solo strumento a fiato"),
-    ("fiato_solf", "Strumento a fiato + solfeggio"),
-    ("solo_arco", "Solo strumento ad arco"),
-    ("arco_solf", "Strumento ad arco + solfeggio"),
-]
-
-PRICE_TABLE = {
-    (30, "solo_fiato"): 90.0,
-    (30, "fiato_solf"): 120.0,
-    (30, "solo_arco"): 110.0,
-    (30, "arco_solf"): 160.0,
-    (45, "solo_fiato"): 135.0,
-    (45, "fiato_solf"): 160.0,
-    (45, "solo_arco"): 165.0,
-    (45, "arco_solf"): 220.0,
-    (60, "solo_fiato"): 180.0,
-    (60, "fiato_solf"): 190.0,
-    (60, "solo_arco"): 220.0,
-    (60, "arco_solf"): 240.0,
-}
-DEFAULT_PRICES_BY_MIN = {30: 120.0, 45: 180.0, 60: 240.0}
-LESSONS_PER_PACKAGE = 10
-
-# default_enrollments = {
-#     (30, "solo_fiato"): 1,
-#     (30, "fiato_solf"): 12,
-#     (30, "solo_arco"): 0,
-#     (30, "arco_solf"): 13,
-#     (45, "solo_fiato"): 9,
-#     (45, "fiato_solf"): 16,
-#     (45, "solo_arco"): 11,
-#     (45, "arco_solf"): 11,
-#     (60, "solo_fiato"): 8,
-#     (60, "fiato_solf"): 4,
-#     (60, "solo_arco"): 10,
-#     (60, "arco_solf"): 2,
-# }
-# default_enrollments = {
-#     (30, "solo_fiato"): 1,
-#     (30, "fiato_solf"): 12,
-#     (30, "solo_arco"): 0,
-#     (30, "arco_solf"): 13,
-#     (45, "solo_fiato"): 9,
-#     (45, "fiato_solf"): 16,
-#     (45, "solo_arco"): 11,
-#     (45, "arco_solf"): 11,
-#     (60, "solo_fiato"): 8,
-#     (60, "fiato_solf"): 4,
-#     (60, "solo_arco"): 10,
-#     (60, "arco_solf"): 2,
-# }
-
-# defaults_specials = {
-#     "prop": {"students": 0, "duration": 60, "price": 100},
-#     "svil": {"students": 5, "duration": 45, "price": 80},
-#     "fasce": {"students": 0, "duration": 30, "price": 80},
-#     "solo_solfeggio": {"students": 12, "duration": 60, "price": 100},
-# }
-
-# defaults_specials = {
-#     "prop": {"students": 0, "duration": 60, "price": 100},
-#     "svil": {"students": 5, "duration": 45, "price": 80},
-#     "fasce": {"students": 0, "duration": 30, "price": 80},
-#     "solo_solfeggio": {"students": 12, "duration": 60, "price": 100},
-# }
-
-
 # ----------------------------
 # FUNZIONI UTILI
 # ----------------------------
@@ -239,6 +78,161 @@ def reset_session_keys(keys, defaults=None, rerun=True):
                 pass
 
 
+def apply_sheet_defaults(snapshot=None):
+    """
+    Rimuove gli input iscritti/specials dalla sessione,
+    così al rerun vengono reinizializzati con i valori dell'ultima lettura.
+    """
+    for k in list(st.session_state.keys()):
+        if k.startswith(("iscr_", "special_")):
+            del st.session_state[k]
+    st.session_state["data_updated"] = False
+    # versione già applicata agli input: render_data_status non deve
+    # riproporla come nuova
+    if snapshot is None:
+        snapshot = get_cache().get()
+    st.session_state["data_version"] = snapshot["version"]
+
+
+def refresh_from_sheet():
+    """Rilegge subito il foglio (bloccante) e riporta gli input ai nuovi valori."""
+    try:
+        snapshot = get_cache().refresh()
+    except Exception as e:
+        st.session_state["refresh_error"] = str(e)
+        return
+    apply_sheet_defaults(snapshot)
+
+
+# ----------------------------
+# MODELLO CONDIVISO TRA I FRAMMENTI
+# ----------------------------
+# La pagina è divisa in frammenti (st.fragment) che leggono input e totali da
+# st.session_state["model"]. Quando cambia un iscritto o un prezzo il callback
+# del widget aggiorna il grafo e rilancia solo i frammenti che mostrano un
+# nodo cambiato; le impostazioni della sidebar rilanciano tutta la pagina.
+ENROLLMENT_KEYS = {(d, k): f"iscr_{k}_{d}" for d in DURATIONS for k, _ in courses}
+SPECIAL_INPUT_KEYS = {k: f"special_{k}_students" for k in SPECIAL_KEYS}
+PRICE_KEYS = {(d, k): f"price_{k}_{d}" for d in DURATIONS for k, _ in courses}
+
+# input del grafo modificabili dalla pagina: le analisi (Monte Carlo,
+# pareggio, prezzi suggeriti) usano lo scenario completo, non solo i totali
+SCENARIO_NODES = frozenset(
+    [f"input:enroll:{d}:{k}" for d, k in ENROLLMENT_KEYS]
+    + [f"input:price:{d}:{k}" for d, k in PRICE_KEYS]
+    + [f"input:special:{k}" for k in SPECIAL_INPUT_KEYS]
+)
+
+# frammento → nodi del grafo (model_graph) che legge
+FRAGMENT_NODES = {
+    "charts": {"total_week_hours", "total_revenue", "costs"},
+    "dashboard": {
+        "total_revenue",
+        "costs",
+        "deviation",
+        "total_week_hours",
+        "saturation",
+    },
+    # la griglia varia minimo allievi e costo orario: servono ricavi, ore
+    # individuali e allievi da raggruppare in classi
+    "sensitivity": {
+        "total_revenue",
+        "individual_hours",
+        "solfeggio_students_by_duration",
+    }
+    | {f"input:special:{k}" for k in GROUP_SPECIALS},
+    "monte_carlo": SCENARIO_NODES,
+    "break_even": SCENARIO_NODES,
+    "optimizer": SCENARIO_NODES,
+    "classes": {"solfeggio_class_count_by_duration", "group_class_count"},
+    "cost_summary": {
+        "costs",
+        "total_hours",
+        "total_revenue",
+        "deviation",
+        "weekly_individual_hours",
+        "weekly_solfeggio_hours",
+        "weekly_group_hours",
+        "weekly_total_hours",
+    },
+    "detail": {"detail_rows"},
+}
+
+
+def read_page_inputs(settings):
+    """
+    Input di compute_totals: iscritti, corsi di gruppo e prezzi dai widget
+    (st.session_state), impostazioni della sidebar e default da settings.
+    """
+    defaults_specials = settings["defaults_specials"]
+    specials_data = {
+        k: {
+            "students": st.session_state[session_key],
+            "duration": defaults_specials[k]["duration"],
+            "price": defaults_specials[k]["price"],
+        }
+        for k, session_key in SPECIAL_INPUT_KEYS.items()
+    }
+    enrolls, specials = read_enrollments(
+        ENROLLMENT_KEYS, specials_data, st.session_state
+    )
+    price_overrides = {cell: st.session_state[key] for cell, key in PRICE_KEYS.items()}
+    return dict(
+        enrolls=enrolls,
+        specials=specials,
+        specials_data=specials_data,
+        price_overrides=price_overrides,
+        **settings,
+    )
+
+
+def update_model(settings):
+    """
+    Aggiorna il grafo della sessione con gli input della pagina e salva in
+    st.session_state["model"] impostazioni, scenario e totali (pacchetto da
+    10 lezioni). Restituisce i nomi di input e nodi cambiati.
+    """
+    scenario = read_page_inputs(settings)
+    if "model_graph" not in st.session_state:
+        st.session_state["model_graph"] = build_totals_graph()
+    graph = st.session_state["model_graph"]
+    graph.update(graph_inputs(**scenario, num_lessons=LESSONS_PER_PACKAGE))
+    st.session_state["model"] = {
+        "settings": settings,
+        "scenario": scenario,
+        "totals": graph["totals"],
+    }
+    return graph.last_changed
+
+
+def rerun_changed_fragments(*always):
+    """Ricalcola il modello e rilancia i frammenti interessati più `always`."""
+    changed = update_model(st.session_state["model"]["settings"])
+    scope = [
+        name for name, nodes in FRAGMENT_NODES.items() if not nodes.isdisjoint(changed)
+    ]
+    st.rerun(scope=[*always, *scope, "diagnostics"])
+
+
+def keep_widget_state(keys):
+    # i widget di una sezione chiusa non vengono disegnati e Streamlit ne
+    # cancellerebbe i valori: riassegnarli li conserva per la riapertura
+    for key in keys:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+
+def on_input_change():
+    # callback dei widget di iscritti e prezzi
+    rerun_changed_fragments()
+
+
+def reset_inputs(keys):
+    # azzera gli input e rilancia anche il frammento che li mostra
+    reset_session_keys(keys, rerun=False)
+    rerun_changed_fragments("inputs")
+
+
 # ----------------------------
 # RENDER: SIDEBAR e INPUT
 # ----------------------------
@@ -271,225 +265,130 @@ def render_sidebar_settings():
     )
 
 
+def render_data_status(snapshot):
+    # avviso (una volta per sessione) quando un aggiornamento in background
+    # ha portato nuovi dati rispetto al rerun precedente
+    seen_version = st.session_state.get("data_version")
+    if seen_version is not None and seen_version != snapshot["version"]:
+        st.toast("🔄 Dati aggiornati dal foglio")
+        st.session_state["data_updated"] = True
+    st.session_state["data_version"] = snapshot["version"]
+
+    cache = get_cache()
+    st.sidebar.header("📥 Dati dal foglio")
+    age_min = cache_age(snapshot["fetched_at"]) / 60
+    from_disk = (
+        " (copia locale, verifica in corso)" if snapshot.get("from_disk") else ""
+    )
+    st.sidebar.caption(
+        f"Sorgente: {cache.source.describe()}. "
+        f"Ultima lettura {age_min:.0f} min fa{from_disk} "
+        f"(rilettura automatica in background ogni {CACHE_TTL / 60:.0f} min)."
+    )
+    if st.session_state.get("data_updated"):
+        st.sidebar.info("Sono disponibili nuovi valori letti dal foglio.")
+        st.sidebar.button(
+            "📥 Usa i nuovi valori",
+            on_click=apply_sheet_defaults,
+            help="Riporta iscritti e corsi di gruppo ai valori appena letti.",
+        )
+    if snapshot["rejected"]:
+        with st.sidebar.expander(
+            f"⚠️ {len(snapshot['rejected'])} celle del foglio ignorate", expanded=False
+        ):
+            st.dataframe(
+                pd.DataFrame(snapshot["rejected"]).rename(
+                    columns={
+                        "cell": "Cella",
+                        "column": "Colonna",
+                        "value": "Valore",
+                        "reason": "Motivo",
+                    }
+                ),
+                hide_index=True,
+            )
+    refresh_error = st.session_state.pop("refresh_error", None) or cache.last_error
+    if refresh_error:
+        st.sidebar.warning(
+            f"Aggiornamento non riuscito, mostro i dati precedenti: {refresh_error}"
+        )
+    st.sidebar.button(
+        "🔄 Aggiorna dal foglio",
+        on_click=refresh_from_sheet,
+        help="Rilegge subito il foglio e riporta gli iscritti ai valori letti.",
+    )
+
+
 def render_input_iscritti(defaults):
     with st.expander("📝 1) Inserisci iscritti per corso e durata", expanded=False):
         st.subheader("🧑‍🎓 Inserisci iscritti per corso e durata")
-        enrollment_keys = {}
-        for duration in [30, 45, 60]:
+        for duration in DURATIONS:
             st.markdown(f"**⏱ Durata {duration} min**")
             cols = st.columns(4)
             for i, (key, label) in enumerate(courses):
-                session_key = f"iscr_{key}_{duration}"
-                _val = cols[i].number_input(
+                cols[i].number_input(
                     f"{label}",
                     min_value=0,
                     value=defaults.get((duration, key), 0),
-                    key=session_key,
+                    key=ENROLLMENT_KEYS[(duration, key)],
+                    on_change=on_input_change,
                 )
-                enrollment_keys[(duration, key)] = session_key
 
-        enrollment_keys_list = [v for v in enrollment_keys.values()]
         st.button(
             "🔄 Azzera iscritti principali",
-            on_click=reset_session_keys,
-            kwargs={"keys": enrollment_keys_list},
+            on_click=reset_inputs,
+            kwargs={"keys": list(ENROLLMENT_KEYS.values())},
         )
-        return enrollment_keys
 
 
 def render_input_specials(defaults):
     with st.expander("🎯 2) Inserisci corsi di gruppo", expanded=False):
         st.subheader("👥 Inserisci altri corsi / attività")
-        specials_data = {}
         cols = st.columns(4)
-        # lista delle chiavi reali usate nei number_input
-        special_input_keys = []
-        for i, key in enumerate(["prop", "svil", "fasce", "solo_solfeggio"]):
-            session_key = f"special_{key}_students"
-            s = cols[i].number_input(
+        for i, (key, session_key) in enumerate(SPECIAL_INPUT_KEYS.items()):
+            cols[i].number_input(
                 f"{key} - numero iscritti",
                 0,
                 200,
                 defaults[key]["students"],
                 key=session_key,
+                on_change=on_input_change,
             )
-            special_input_keys.append(session_key)
-            specials_data[key] = {
-                "students": s,
-                "duration": defaults[key]["duration"],
-                "price": defaults[key]["price"],
-            }
 
         # Pulsante che azzera *le stesse* chiavi dei number_input.
-        # Se vuoi ripristinare ai default, passa defaults_map={"special_prop_students": defaults["prop"]["students"], ...}
-        def _reset_specials_to_zero():
-            reset_session_keys(special_input_keys, defaults=None, rerun=True)
-
         st.button(
             "🔄 Azzera specials",
-            on_click=_reset_specials_to_zero,
+            on_click=reset_inputs,
+            kwargs={"keys": list(SPECIAL_INPUT_KEYS.values())},
         )
 
-        return specials_data
-
 
 def render_prices(defaults):
     with st.expander("🏷️ 3) Inserisci prezzi per singolo corso", expanded=False):
         st.subheader("💵 Prezzi per singolo corso (€/10 lezioni)")
-        price_overrides = {}
-        for duration in [30, 45, 60]:
+        for duration in DURATIONS:
             st.markdown(f"**⏱ Durata {duration} min**")
             cols = st.columns(4)
             for i, (key, label) in enumerate(courses):
                 default_price = defaults.get(
                     (duration, key), DEFAULT_PRICES_BY_MIN[duration]
                 )
-                price_key = f"price_{key}_{duration}"
-                price_overrides[(duration, key)] = cols[i].number_input(
-                    label, 0.0, 500.0, float(default_price), key=price_key
+                cols[i].number_input(
+                    label,
+                    0.0,
+                    500.0,
+                    float(default_price),
+                    key=PRICE_KEYS[(duration, key)],
+                    on_change=on_input_change,
                 )
-    return price_overrides
-
-
-# ----------------------------
-# READ / CALC
-# ----------------------------
-def read_enrollments(enrollment_keys, specials_data):
-    enrolls = {
-        (duration, key): int(st.session_state.get(session_key, 0))
-        for (duration, key), session_key in enrollment_keys.items()
-    }
-    specials = {k: v["students"] for k, v in specials_data.items()}
-    return enrolls, specials
 
 
-def compute_totals(
-    enrolls,
-    specials,
-    specials_data,
-    price_overrides,
-    min_students,
-    hourly_teacher_cost,
-    contributi,
-    costi_fissi,
-    num_lessons=LESSONS_PER_PACKAGE,
-):
-    """
-    Restituisce i totali per un pacchetto di num_lessons:
-    - ricavi, ore (pacchetto e settimanali), costi (docente + solfeggio), deviazione
-    - solfeggio raggruppato per durata (30/45/60)
-    """
-    total_revenue = 0.0
-    detail_rows = []
-
-    # RICAVI corsi principali
-    for (duration, key), n_students in enrolls.items():
-        price = price_overrides.get((duration, key), DEFAULT_PRICES_BY_MIN[duration])
-        revenue = n_students * price * (num_lessons / LESSONS_PER_PACKAGE)
-        total_revenue += revenue
-        detail_rows.append(
-            {
-                "course_label": key,
-                "duration_min": duration,
-                "n_students": n_students,
-                "price_per_10_lezioni": price,
-                "revenue_for_package": revenue,
-            }
-        )
-
-    # RICAVI speciali (uso specials_data per price/duration)
-    for k, n_students in specials.items():
-        if n_students <= 0:
-            continue
-        meta = specials_data.get(k, {})
-        price = meta.get("price", defaults_specials.get(k, {}).get("price", 0.0))
-        duration = meta.get(
-            "duration", defaults_specials.get(k, {}).get("duration", 60)
-        )
-        revenue = n_students * price * (num_lessons / LESSONS_PER_PACKAGE)
-        total_revenue += revenue
-        detail_rows.append(
-            {
-                "course_label": k,
-                "duration_min": duration,
-                "n_students": n_students,
-                "price_per_10_lezioni": price,
-                "revenue_for_package": revenue,
-            }
-        )
-
-    # aggiungo contributi (se presenti) ai ricavi netti
-    # total_revenue += float(contributi or 0.0)
-
-    # Ore per pacchetto (moltiplicate per num_lessons)
-    individual_hours = sum(
-        int(n) * (duration / 60.0) * num_lessons
-        for (duration, key), n in enrolls.items()
-        if key in ("solo_fiato", "solo_arco", "fiato_solf", "arco_solf")
-    )
-
-    # Solfeggio: sommo studenti per durata (fiato_solf + arco_solf),
-    # aggiungo i solo_solfeggio al gruppo 60 e poi calcolo classi (ceil once)
-    solfeggio_class_count_by_duration = {}
-    for d in (30, 45, 60):
-        students = int(enrolls.get((d, "fiato_solf"), 0)) + int(
-            enrolls.get((d, "arco_solf"), 0)
-        )
-        if d == 60:
-            students += int(specials.get("solo_solfeggio", 0))
-        class_count = ceil(students / min_students) if students > 0 else 0
-        solfeggio_class_count_by_duration[d] = class_count
-
-    # ogni classe di solfeggio dura 1 ora, moltiplichiamo per num_lessons
-    solfeggio_class_hours = sum(
-        count * 1.0 * num_lessons
-        for count in solfeggio_class_count_by_duration.values()
-    )
-
-    # Altri corsi in classe: prop, svil, fasce (durata presa da specials_data)
-    other_class_hours = 0.0
-    for k in ("prop", "svil", "fasce"):
-        n_students = int(specials.get(k, 0))
-        if n_students > 0:
-            duration = specials_data.get(k, {}).get(
-                "duration", defaults_specials.get(k, {}).get("duration", 60)
-            )
-            other_class_hours += (
-                ceil(n_students / min_students) * (duration / 60.0) * num_lessons
-            )
-
-    total_hours = individual_hours + solfeggio_class_hours + other_class_hours
-    total_week_hours = (
-        total_hours / LESSONS_PER_PACKAGE if LESSONS_PER_PACKAGE else total_hours
-    )
-
-    # COSTI
-    individual_costs = hourly_teacher_cost * individual_hours
-    special_costs = hourly_teacher_cost * other_class_hours
-    teacher_cost = hourly_teacher_cost * (individual_hours + other_class_hours)
-    solf_cost = hourly_teacher_cost * solfeggio_class_hours
-    total_costs = teacher_cost + solf_cost# + other_fixed_costs
-    deviation = total_revenue - total_costs
-
-    saturation = (
-        (total_week_hours / total_available_hours) * 100
-        if total_available_hours > 0
-        else 0.0
-    )
-
-    return {
-        "total_revenue": total_revenue,
-        "total_hours": total_hours,
-        "total_week_hours": total_week_hours,
-        "saturation": saturation,
-        "individual_costs": individual_costs,
-        "special_costs": special_costs,
-        "solfeggio_cost": solf_cost,
-        "total_costs": total_costs,
-        "deviation": deviation,
-        "detail_rows": detail_rows,
-        "solfeggio_class_count_by_duration": solfeggio_class_count_by_duration,
-    }
+@st.fragment(key="inputs")
+def render_inputs(default_enrollments, defaults_specials):
+    # i valori sono letti da st.session_state (read_page_inputs)
+    render_input_iscritti(default_enrollments)
+    render_input_specials(defaults_specials)
+    render_prices(PRICE_TABLE)
 
 
 # ----------------------------
@@ -510,10 +409,12 @@ def render_dashboard(totals):
 def render_dashboard_anno(totals, contributi , costi_fissi):
     st.subheader("💡 Riepilogo rapido (anno scolastico senza variazioni)")
 
-    ricavi_annui = 3 * totals["total_revenue"]
-    costi_annui = 3 * totals["total_costs"]
+    ricavi_annui = PACKAGES_PER_YEAR * totals["total_revenue"]
+    costi_annui = PACKAGES_PER_YEAR * totals["total_costs"]
 
-    utile_annuo = ricavi_annui - costi_annui + contributi - costi_fissi
+    utile_annuo = annual_result(
+        totals["total_revenue"], totals["total_costs"], contributi, costi_fissi
+    )
     utile_nocontr = ricavi_annui - costi_annui
 
     cols = st.columns(5)
@@ -525,429 +426,654 @@ def render_dashboard_anno(totals, contributi , costi_fissi):
     cols[2].metric("📉 Risultato netto", f"€ {utile_annuo:,.0f}")
     cols[0].metric("💸 Contributi utilizzati", f"€ {contributi:,.0f}")
     cols[1].metric("🧾 Costi fissi", f"€ {costi_fissi:,.0f}")
-def render_detail_table(totals):
-    st.subheader("📊 Tabella ricavi e costi per corsi individuali")
-    with st.expander("🔎 dettagli ricavi, costi e saldo per corso", expanded=False):
-        df = pd.DataFrame(totals["detail_rows"])
 
-        if df.empty:
-            st.write("Nessun corso con iscritti.")
-            return
 
-        # ------------------------------------------------
-        # 0) Filtra/Nascondi i corsi che non vuoi mostrare
-        # accetta sia le chiavi brevi (prop, svil, fasce, solo_solfeggio)
-        # sia le label estese che potresti avere nei detail_rows
-        # ------------------------------------------------
-        exclude_keys = {"prop", "svil", "fasce", "solo_solfeggio"}
-        exclude_labels = {
-            "Propedeutica",
-            "Propedeutica musicale",
-            "Sviluppo musicalità",
-            "Musica in fasce",
-            "Solo Solfeggio",
-            "Solo solfeggio",
-        }
+# righe della mappa di sensibilità: stesso intervallo del campo in sidebar
+SWEEP_MIN_STUDENTS = tuple(range(1, 16))
 
-        # alcune versioni dei detail_rows potrebbero usare 'course_label' come chiave breve,
-        # altre la label estesa; gestiamo entrambe
-        def row_is_excluded(row):
-            lab = str(row.get("course_label", "")).strip()
-            # confronto diretto con chiavi brevi
-            if lab in exclude_keys:
-                return True
-            # confronto con label estese (casefold per robustezza)
-            if lab.casefold() in {x.casefold() for x in exclude_labels}:
-                return True
-            # alcune volte la chiave originale è in un campo diverso (es. 'course' o 'course_key')
-            if "course" in row and str(row.get("course", "")).strip() in exclude_keys:
-                return True
-            if (
-                "course_key" in row
-                and str(row.get("course_key", "")).strip() in exclude_keys
-            ):
-                return True
-            return False
-
-        # Applichiamo il filtro
-        df = df[~df.apply(row_is_excluded, axis=1)].reset_index(drop=True)
-
-        if df.empty:
-            st.write(
-                "Dopo aver nascosto i corsi selezionati non ci sono righe da mostrare."
-            )
-            return
 
-        # -----------------------------
-        # Mappatura nomi più leggibili
-        # -----------------------------
-        rename_map = {
-            "solo_fiato": "Fiati",
-            "fiato_solf": "Fiati + Solfeggio",
-            "solo_arco": "Archi",
-            "arco_solf": "Archi + Solfeggio",
-            "prop": "Propedeutica",
-            "svil": "Sviluppo musicalità",
-            "fasce": "Musica in fasce",
-            "solo_solfeggio": "Solo Solfeggio",
-        }
+@st.cache_data(max_entries=32, show_spinner=False)
+def sensitivity_grid(fingerprint, _batch, hourly_values):
+    return parameter_grid(_batch, SWEEP_MIN_STUDENTS, hourly_values)
 
-        # normalizza nomi/colonne se necessario
-        if "course_label" not in df.columns and "course" in df.columns:
-            df = df.rename(columns={"course": "course_label"})
-        if "duration_min" not in df.columns and "duration" in df.columns:
-            df = df.rename(columns={"duration": "duration_min"})
-        if "n_students" not in df.columns and "iscritti" in df.columns:
-            df = df.rename(columns={"iscritti": "n_students"})
-        if "price_per_10_lezioni" not in df.columns and "price" in df.columns:
-            df = df.rename(columns={"price": "price_per_10_lezioni"})
-        if "revenue_for_package" not in df.columns and "ricavo" in df.columns:
-            df = df.rename(columns={"ricavo": "revenue_for_package"})
-
-        # applica la mappatura leggibile sulla label e aggiungi i minuti tra parentesi
-        def pretty_label(row):
-            base = row.get("course_label", "")
-            pretty = rename_map.get(base, base)
-            minutes = row.get("duration_min", None)
-            if minutes is not None and str(minutes).strip() != "":
-                try:
-                    return f"{pretty} ({int(minutes)}')"
-                except Exception:
-                    return f"{pretty} ({minutes})"
-            return pretty
-
-        df["course_label"] = df.apply(pretty_label, axis=1)
-
-        # -----------------------------
-        # Calcolo costi per package
-        # formula richiesta: numero_iscritti * 24 * (10/(60/30))
-        # ora implementata usando hourly_teacher_cost (fallback 24) e LESSONS_PER_PACKAGE
-        # -----------------------------
-        hourly = globals().get("hourly_teacher_cost", 24.0)
-        try:
-            hourly = float(hourly)
-        except Exception:
-            hourly = 24.0
-
-        denom = 60.0 / 30.0  # = 2.0
-        lessons_pkg = globals().get("LESSONS_PER_PACKAGE", 10)
-        try:
-            lessons_pkg = float(lessons_pkg)
-        except Exception:
-            lessons_pkg = 10.0
-        multiplier = lessons_pkg / denom  # es. 10 / 2 = 5
-
-        # assicurati colonne esistenti e tipi
-        if "revenue_for_package" not in df.columns:
-            df["revenue_for_package"] = 0.0
-        df["n_students"] = df.get("n_students", 0).fillna(0).astype(int)
-
-        df["cost_per_package"] = df["n_students"] * hourly * multiplier
-        df["saldo"] = df["revenue_for_package"].astype(float) - df[
-            "cost_per_package"
-        ].astype(float)
-
-        # -----------------------------
-        # Formattazione colonna e rinomina colonne per display
-        # -----------------------------
-        df_display = df.copy()
-        for col in [
-            "revenue_for_package",
-            "price_per_10_lezioni",
-            "cost_per_package",
-            "saldo",
-        ]:
-            if col in df_display.columns:
-                df_display[col] = df_display[col].map(lambda x: f"€ {x:,.2f}")
-
-        # colonne da mostrare (ordinamento suggerito)
-        display_cols = [
-            "course_label",
-            "duration_min",
-            "n_students",
-            "price_per_10_lezioni",
-            "revenue_for_package",
-            "cost_per_package",
-            "saldo",
-        ]
-        display_cols = [c for c in display_cols if c in df_display.columns]
-
-        pretty_headers = {
-            "course_label": "Corso",
-            "duration_min": "Minuti",
-            "n_students": "Iscritti",
-            "price_per_10_lezioni": "Prezzo (€/pacchetto)",
-            "revenue_for_package": "Ricavo (€/pacchetto)",
-            "cost_per_package": "Costo (€/pacchetto)",
-            "saldo": "Saldo (€/pacchetto)",
+
+def sensitivity_figure(z, hourly_values, min_students, hourly_teacher_cost, title):
+    fig = go.Figure(
+        go.Heatmap(
+            z=z,
+            x=hourly_values,
+            y=SWEEP_MIN_STUDENTS,
+            colorscale="RdYlGn",
+            zmid=0,
+            colorbar=dict(title="€"),
+            hovertemplate="min. %{y} allievi, %{x:.1f} €/h<br>€ %{z:,.0f}<extra></extra>",
+        )
+    )
+    # punto attuale della sidebar
+    fig.add_trace(
+        go.Scatter(
+            x=[hourly_teacher_cost],
+            y=[min_students],
+            mode="markers",
+            marker=dict(symbol="x", size=14, color="black"),
+            hoverinfo="skip",
+            showlegend=False,
+        )
+    )
+    fig.update_layout(
+        title=title,
+        margin=dict(t=40, b=30, l=20, r=20),
+        height=420,
+        xaxis_title="💶 Costo docente per ora (€)",
+        yaxis_title="👥 Minimo allievi per classe",
+    )
+    return fig
+
+
+def render_sensitivity(scenario, min_students, hourly_teacher_cost):
+    st.markdown("### 🌡️ Sensibilità: minimo allievi e costo docente")
+    with st.expander(
+        "🗺️ scostamento al variare di minimo allievi e costo orario",
+        key="sensitivity_open",
+        on_change="rerun",
+    ) as section:
+        # calcolata solo a sezione aperta (l'apertura rilancia il frammento)
+        if not section.open:
+            return
+        batch = stack_scenarios([scenario])
+        # i due parametri della griglia non fanno parte dell'impronta
+        fixed = {
+            k: v
+            for k, v in batch.items()
+            if k not in ("min_students", "hourly_teacher_cost")
         }
-        df_display = df_display[display_cols].rename(columns=pretty_headers)
+        # ±10 €/h intorno al valore attuale, a passi di 0.5 come in sidebar
+        hourly_values = tuple(
+            h
+            for h in (hourly_teacher_cost + 0.5 * np.arange(-20, 21)).tolist()
+            if h >= 0
+        )
+        grid = sensitivity_grid(scenario_fingerprint(fixed), fixed, hourly_values)
+
+        st.caption("La ✖ indica i valori attuali della sidebar.")
+        tab_quarter, tab_year = st.tabs(["Trimestre", "Anno scolastico"])
+        with tab_quarter:
+            fig = sensitivity_figure(
+                grid["deviation"],
+                hourly_values,
+                min_students,
+                hourly_teacher_cost,
+                "📉 Ricavi - costi per trimestre (€)",
+            )
+            st.plotly_chart(fig, width="stretch")
+        with tab_year:
+            fig = sensitivity_figure(
+                grid["annual_result"],
+                hourly_values,
+                min_students,
+                hourly_teacher_cost,
+                "📉 Risultato netto annuo (€)",
+            )
+            st.plotly_chart(fig, width="stretch")
+
+
+def monte_carlo_figure(result, bins=80):
+    # raggruppo i bin dell'istogramma tra minimo e massimo osservati
+    centers = (result["edges"][:-1] + result["edges"][1:]) / 2
+    edges = np.linspace(result["min"], result["max"] + 1e-9, bins + 1)
+    idx = np.searchsorted(edges, centers, side="right") - 1
+    keep = (idx >= 0) & (idx < bins)
+    counts = np.bincount(idx[keep], weights=result["counts"][keep], minlength=bins)
+    mids = (edges[:-1] + edges[1:]) / 2
+    fig = go.Figure(
+        go.Bar(
+            x=mids,
+            y=counts / result["draws"] * 100,
+            marker_color=np.where(mids < 0, "#EF553B", "#00CC96"),
+            hovertemplate="€ %{x:,.0f}<br>%{y:.2f} %<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title="📊 Distribuzione del risultato netto annuo",
+        margin=dict(t=40, b=30, l=20, r=20),
+        height=360,
+        bargap=0,
+        xaxis_title="€",
+        yaxis_title="% estrazioni",
+    )
+    fig.update_xaxes(tickformat=",")
+    return fig
 
-        st.dataframe(df_display)
 
+# intervalli degli iscritti per corso (distribuzione "range"): widget per corso
+MC_RANGE_KEYS = {
+    key: f"mc_range_{key}" for key in [k for k, _ in courses] + list(SPECIAL_KEYS)
+}
 
-# ----------------------------
-# LOGICA STREAMLIT (esecuzione)
-# ----------------------------
-(
-    min_students,
-    hourly_teacher_cost,
-    total_available_hours,
-    contributi,
-    costi_fissi,
-) = render_sidebar_settings()
-enrollment_keys = render_input_iscritti(default_enrollments)
-specials_data = render_input_specials(defaults_specials)
-price_overrides = render_prices(PRICE_TABLE)
-
-enrolls, specials = read_enrollments(enrollment_keys, specials_data)
-
-# calcoli per pacchetto 10 lezioni (tot_10)
-tot_10 = compute_totals(
-    enrolls=enrolls,
-    specials=specials,
-    specials_data=specials_data,
-    price_overrides=price_overrides,
-    min_students=min_students,
-    hourly_teacher_cost=hourly_teacher_cost,
-    contributi=contributi,
-    costi_fissi=costi_fissi,
-    num_lessons=LESSONS_PER_PACKAGE,
-)
 
-# ----------------------------
-# GRAFICI: barre + semicerchio (pie rimodulato)
-# ----------------------------
-col_left, col_right = st.columns(2)
-totals = tot_10
+def render_monte_carlo(scenario):
+    st.markdown("### 🎲 Incertezza sugli iscritti (Monte Carlo)")
+    with st.expander(
+        "🎲 distribuzione del risultato netto annuo",
+        key="monte_carlo_open",
+        on_change="rerun",
+    ) as section:
+        if not section.open:
+            keep_widget_state(["mc_distribution", "mc_draws", *MC_RANGE_KEYS.values()])
+            return
+        st.write(
+            "Gli iscritti inseriti sono trattati come previsioni: ogni estrazione "
+            "varia gli iscritti di ogni corso e ricalcola il risultato netto annuo."
+        )
+        cols = st.columns(2)
+        distribution = cols[0].radio(
+            "Distribuzione iscritti",
+            ["poisson", "range"],
+            format_func={
+                "poisson": "Poisson (media = previsione)",
+                "range": "Intervallo per corso (%)",
+            }.get,
+            key="mc_distribution",
+        )
+        draws = cols[1].select_slider(
+            "Estrazioni (massimo)",
+            [100_000, 250_000, 500_000, 1_000_000],
+            value=1_000_000,
+            key="mc_draws",
+        )
 
-used_week_hours = totals.get("total_week_hours", 0.0)
-available_hours = (
-    float(total_available_hours) if "total_available_hours" in globals() else 1.0
-)
-used = min(used_week_hours, available_hours)
-remaining = max(available_hours - used, 0.0)
-
-# Semicerchio ottenuto con pie: colori nella metà superiore (rosso = usate, blu = rimanenti)
-# costruiamo values in modo che la fetta trasparente occupi la metà inferiore
-# per l'effetto semicerchio disponiamo i valori in ordine e ruotiamo di 180°
-fig_semi = go.Figure(
-    go.Pie(
-        values=[remaining, used],
-        hole=0.6,
-        sort=False,
-        direction="clockwise",
-        marker=dict(
-            colors=[
-                "rgba(0,0,0,0)",  # filler (meta' inferiore invisibile)
-                "#EF553B",  # rosso: ore usate
-                # "#636EFA",  # blu: ore rimanenti
-            ],
-            line=dict(color="white", width=1),
-        ),
-        textinfo="none",
-        hoverinfo="value",
-        rotation=0,
-    )
-)
+        ranges = None
+        if distribution == "range":
+            st.write(
+                "Variazione degli iscritti per corso rispetto ai valori inseriti "
+                "(estrazioni uniformi tra minimo e massimo, per ogni durata)"
+            )
+            labels = dict(courses) | SPECIAL_LABELS
+            cols = st.columns(4)
+            ranges = {}
+            for i, (key, session_key) in enumerate(MC_RANGE_KEYS.items()):
+                low, high = cols[i % 4].slider(
+                    labels[key], -80, 100, (-20, 20), step=5, key=session_key
+                )
+                ranges[key] = (low / 100, high / 100)
+        else:
+            keep_widget_state(MC_RANGE_KEYS.values())
+
+        batch = stack_scenarios([scenario])
+        run_key = (
+            scenario_fingerprint(batch),
+            distribution,
+            canonical_key(ranges),
+            draws,
+        )
+        if st.button("▶️ Avvia simulazione", key="mc_run"):
+            bar = st.progress(0.0, text="Simulazione in corso...")
+
+            def progress(done, total, summary):
+                bar.progress(
+                    done / total,
+                    text=f"{done:,} estrazioni — mediana € "
+                    f"{summary['percentiles'][50]:,.0f}",
+                )
 
-pct = (used / available_hours * 100) if available_hours > 0 else 0.0
-fig_semi.update_layout(
-    title="🕒 Utilizzo ore sede",
-    title_x=0.35,
-    showlegend=False,
-    margin=dict(t=30, b=0, l=0, r=0),
-    height=300,
-    annotations=[
-        dict(
-            text=f"<b>{used:.1f} / {available_hours:.1f} h</b><br><span style='font-size:12px'>usate / disponibili</span>",
-            x=0.5,
-            y=0.52,
-            showarrow=False,
-        ),
-        dict(
-            text=f"{pct:.1f}%",
-            x=0.5,
-            y=0.36,
-            showarrow=False,
-            font=dict(size=16),
-        ),
-    ],
-)
+            result = run_monte_carlo(
+                batch,
+                draws=draws,
+                distribution=distribution,
+                ranges=ranges,
+                seed=0,
+                progress=progress,
+            )
+            bar.empty()
+            st.session_state["mc_result"] = (run_key, result)
 
-with col_right:
-    st.plotly_chart(fig_semi, width="stretch")
+        stored = st.session_state.get("mc_result")
+        if stored is None:
+            st.caption("Premi «Avvia simulazione» per calcolare la distribuzione.")
+            return
+        stored_key, result = stored
+        if stored_key != run_key:
+            st.info(
+                "Gli input sono cambiati dopo l'ultima simulazione: "
+                "i risultati qui sotto si riferiscono ai valori precedenti."
+            )
 
-# Grafico a barre: Ricavi vs Costi
-ricavi = totals.get("total_revenue", 0.0)
-costi = totals.get("total_costs", 0.0)
-df_bar = pd.DataFrame(
-    {"Categoria": ["Ricavi totali", "Costi totali"], "Valore": [ricavi, costi]}
-)
-fig_bar = px.bar(df_bar, x="Categoria", y="Valore", text="Valore", height=360)
-fig_bar.update_traces(
-    texttemplate="€ %{y:,.2f}",
-    textposition="outside",
-    marker_color=["#00CC96", "#636EFA"],
-)
-fig_bar.update_layout(
-    title="💹 Confronto Ricavi e Costi",
-    title_x=0.35,
-    margin=dict(t=30, b=30, l=20, r=20),
-    yaxis_title="€",
-    xaxis_title="",
-    showlegend=False,
-)
-max_val = max(ricavi, costi)
-fig_bar.update_yaxes(tickformat=",", range=[0, max_val + 5000])
-with col_left:
-    st.plotly_chart(
-        fig_bar, config={"staticPlot": True, "displayModeBar": True}, width="stretch"
-    )
+        pct = result["percentiles"]
+        cols = st.columns(5)
+        cols[0].metric("📉 Pessimistico (P5)", f"€ {pct[5]:,.0f}")
+        cols[1].metric("⚖️ Mediana (P50)", f"€ {pct[50]:,.0f}")
+        cols[2].metric("📈 Ottimistico (P95)", f"€ {pct[95]:,.0f}")
+        cols[3].metric("🔻 Probabilità di perdita", f"{result['p_loss'] * 100:.1f} %")
+        cols[4].metric("🎲 Estrazioni", f"{result['draws']:,}")
+        if result["converged"]:
+            st.caption(
+                "Simulazione fermata in anticipo: i percentili erano già stabili."
+            )
+        st.plotly_chart(monte_carlo_figure(result), width="stretch")
+
+
+def render_break_even(scenario):
+    st.markdown("### 🎯 Pareggio e obiettivo annuo")
+    with st.expander(
+        "🎯 cosa serve per raggiungere il risultato netto annuo desiderato",
+        key="break_even_open",
+        on_change="rerun",
+    ) as section:
+        if not section.open:
+            keep_widget_state(["break_even_target"])
+            return
+        target = st.number_input(
+            "Risultato netto annuo obiettivo (€)",
+            -100000.0,
+            100000.0,
+            0.0,
+            step=500.0,
+            key="break_even_target",
+        )
 
+        price = break_even_price(scenario, target)
+        if price is None:
+            st.write("Nessun ricavo: l'aumento dei prezzi non basta.")
+        elif price["increase"] <= 0:
+            st.write(
+                f"✅ Obiettivo già raggiunto: i prezzi potrebbero scendere del "
+                f"{-price['increase'] * 100:.1f}% "
+                f"(risultato € {price['annual_result']:,.0f})."
+            )
+            return
+        else:
+            st.write(
+                f"🏷️ Aumento uniforme di tutti i prezzi: **+{price['increase'] * 100:.1f}%** "
+                f"(risultato € {price['annual_result']:,.0f})."
+            )
+
+        labels = dict(courses) | SPECIAL_LABELS
+        rows = [
+            {
+                "Corso": labels.get(r["course"], r["course"]),
+                "Durata (min)": r["duration"],
+                "Allievi in più": r["extra_students"],
+                "Risultato netto annuo (€)": r.get("annual_result"),
+                "Saturazione (%)": r["totals"]["saturation"] if "totals" in r else None,
+            }
+            for r in break_even_students(scenario, target)
+        ]
+        st.write(
+            "👥 In alternativa, allievi in più in un solo corso "
+            "(vuoto = non basta aggiungere allievi a quel corso):"
+        )
+        st.dataframe(
+            pd.DataFrame(rows).style.format(
+                {
+                    "Durata (min)": "{:.0f}",
+                    "Allievi in più": "{:.0f}",
+                    "Risultato netto annuo (€)": "€ {:,.0f}",
+                    "Saturazione (%)": "{:.1f} %",
+                },
+                na_rep="",
+            ),
+            hide_index=True,
+        )
 
-render_dashboard(tot_10)
-render_dashboard_anno(tot_10, contributi,costi_fissi)
 
-# -----------------------------
-# RIEPILOGO CLASSI e DETTAGLIO
-# -----------------------------
-st.markdown("### 📚 Riepilogo Classi Formate")
-with st.expander("🔢 riepilogo classi formate", expanded=False):
-    # calcoli locali per classi di solfeggio raggrupate per minutaggio strumento
-    solfeggio_class_count_by_duration = {}
-    solfeggio_students_by_duration = {}
-    for d in (30, 45, 60):
-        students = int(enrolls.get((d, "fiato_solf"), 0)) + int(
-            enrolls.get((d, "arco_solf"), 0)
+@st.cache_data(max_entries=32, show_spinner=False)
+def optimized_prices(fingerprint, _batch, bounds, elasticity):
+    prices = _batch["prices"][0]
+    low, high = bounds
+    return optimize_prices(
+        _batch, prices * (1 + low / 100), prices * (1 + high / 100), elasticity
+    )
+
+
+def render_price_optimizer(scenario):
+    st.markdown("### 🧮 Prezzi suggeriti")
+    with st.expander(
+        "🧮 prezzi che massimizzano il margine entro le ore disponibili",
+        key="optimizer_open",
+        on_change="rerun",
+    ) as section:
+        if not section.open:
+            keep_widget_state(
+                ["opt_bounds"] + [f"opt_elasticity_{key}" for key, _ in courses]
+            )
+            return
+        bounds = st.slider(
+            "Variazione ammessa dei prezzi attuali (%)",
+            -50,
+            50,
+            (-20, 20),
+            step=5,
+            key="opt_bounds",
         )
-        if d == 60:
-            students += int(
-                specials_data.get("solo_solfeggio", {}).get(
-                    "students", defaults_specials["solo_solfeggio"]["students"]
-                )
+        st.write(
+            "Elasticità degli iscritti al prezzo per corso "
+            "(0 = gli iscritti non cambiano; 1 = +10% di prezzo ≈ -10% di iscritti)"
+        )
+        cols = st.columns(4)
+        elasticity = tuple(
+            cols[i].number_input(
+                label, 0.0, 5.0, 0.0, step=0.1, key=f"opt_elasticity_{key}"
             )
-        solfeggio_students_by_duration[d] = students
-        solfeggio_class_count_by_duration[d] = (
-            ceil(students / min_students) if students > 0 else 0
+            for i, (key, label) in enumerate(courses)
         )
 
-    prop_classes = (
-        ceil(
-            specials_data.get("prop", {}).get(
-                "students", defaults_specials["prop"]["students"]
+        batch = stack_scenarios([scenario])
+        result = optimized_prices(
+            scenario_fingerprint(batch), batch, bounds, elasticity
+        )
+        current, proposed = result["current"], result["proposed"]
+        if not result["feasible"]:
+            st.warning(
+                "Nessuna combinazione di prezzi nei limiti rientra nelle ore "
+                "disponibili: la proposta è quella che le supera di meno."
             )
-            / min_students
+
+        cols = st.columns(3)
+        cols[0].metric(
+            "📉 Ricavi - costi (trimestre)",
+            f"€ {proposed['deviation']:,.0f}",
+            f"€ {proposed['deviation'] - current['deviation']:,.0f}",
         )
-        if specials_data.get("prop", {}).get("students", 0) > 0
-        else 0
-    )
-    fasce_classes = (
-        ceil(
-            specials_data.get("fasce", {}).get(
-                "students", defaults_specials["fasce"]["students"]
+        cols[1].metric(
+            "💰 Ricavi totali",
+            f"€ {proposed['total_revenue']:,.0f}",
+            f"€ {proposed['total_revenue'] - current['total_revenue']:,.0f}",
+        )
+        cols[2].metric(
+            "⏱️ Ore settimanali",
+            f"{proposed['total_week_hours']:.2f} h",
+            f"{proposed['total_week_hours'] - current['total_week_hours']:.2f} h",
+            delta_color="inverse",
+        )
+
+        rows = []
+        for (duration, key), price in result["price_overrides"].items():
+            old_price = scenario["price_overrides"].get(
+                (duration, key), DEFAULT_PRICES_BY_MIN[duration]
             )
-            / min_students
+            rows.append(
+                {
+                    "Corso": dict(courses)[key],
+                    "Durata (min)": duration,
+                    "Prezzo attuale (€)": old_price,
+                    "Prezzo proposto (€)": price,
+                    "Variazione (%)": (
+                        (price / old_price - 1) * 100 if old_price else 0.0
+                    ),
+                    "Iscritti attuali": scenario["enrolls"].get((duration, key), 0),
+                }
+            )
+        df = pd.DataFrame(rows)
+        df["Iscritti attesi"] = result["enrollments"].ravel()
+        st.dataframe(
+            df.style.format(
+                {
+                    "Prezzo attuale (€)": "€ {:,.2f}",
+                    "Prezzo proposto (€)": "€ {:,.2f}",
+                    "Variazione (%)": "{:+.1f} %",
+                }
+            ),
+            hide_index=True,
         )
-        if specials_data.get("fasce", {}).get("students", 0) > 0
-        else 0
-    )
 
-    classi_df = pd.DataFrame(
-        {
-            "Tipologia Classe": [
-                "Solfeggio 30 min",
-                "Solfeggio 45 min",
-                "Solfeggio 60 min",
-                "Propedeutica",
-                "Musica in fasce",
-            ],
-            "Numero classi": [
-                solfeggio_class_count_by_duration.get(30, 0),
-                solfeggio_class_count_by_duration.get(45, 0),
-                solfeggio_class_count_by_duration.get(60, 0),
-                prop_classes,
-                fasce_classes,
-            ],
-        }
-    )
-    st.markdown(
-        classi_df.to_html(index=False, justify="center"), unsafe_allow_html=True
-    )
 
+def render_detail_table(totals, table_key):
+    st.subheader("📊 Tabella ricavi e costi per corsi individuali")
+    with st.expander("🔎 dettagli ricavi, costi e saldo per corso", expanded=False):
+        df_display, message = memoized(
+            "detail_table",
+            table_key,
+            lambda: detail_table_frame(totals["detail_rows"]),
+        )
+        if message:
+            st.write(message)
+        else:
+            st.caption(
+                "Costo: ore docente del corso × costo orario (lezioni individuali "
+                "più la quota delle classi di solfeggio della stessa durata, "
+                "divisa in proporzione agli allievi)."
+            )
+            st.dataframe(
+                df_display,
+                column_config={
+                    col: st.column_config.NumberColumn(format="€ %,.2f")
+                    for col in DETAIL_MONEY_COLUMNS
+                },
+                hide_index=True,
+            )
 
-# -----------------------------
-# Dettaglio costi e ore (espandibile)
-# -----------------------------
-st.markdown("### 📊 Riepilogo Costi, Ricavi e Ore")
-with st.expander("📈 Riepilogo costi, ricavi e ore (dettaglio)", expanded=False):
-    col1, col2 = st.columns(2)
-    # calcoli settimanali (senza moltiplicare per num_lessons)
-    weekly_individual_hours = sum(
-        int(n) * (duration / 60.0)
-        for (duration, key), n in enrolls.items()
-        if key in ("solo_fiato", "solo_arco", "fiato_solf", "arco_solf")
+
+# ----------------------------
+# RENDER: FRAMMENTI
+# ----------------------------
+# Ogni frammento legge input e totali da st.session_state["model"] (vedi
+# update_model): i suoi argomenti resterebbero quelli dell'ultimo rerun completo.
+@st.fragment(key="charts")
+def render_charts():
+    model = st.session_state["model"]
+    totals = model["totals"]
+    col_left, col_right = st.columns(2)
+
+    # figure conservate per sessione: aggiornate solo quando cambiano i valori
+    fig_semi = cached_figure(
+        st.session_state,
+        "fig_semi",
+        hours_base_figure,
+        patch_hours_figure,
+        totals.get("total_week_hours", 0.0),
+        float(model["settings"]["total_available_hours"]),
     )
-    weekly_solfeggio_hours = sum(
-        count * 1.0 for count in solfeggio_class_count_by_duration.values()
+    with col_right:
+        st.plotly_chart(fig_semi, width="stretch")
+
+    # Grafico a barre: Ricavi vs Costi
+    fig_bar = cached_figure(
+        st.session_state,
+        "fig_bar",
+        revenue_cost_base_figure,
+        patch_revenue_cost_figure,
+        totals.get("total_revenue", 0.0),
+        totals.get("total_costs", 0.0),
     )
-    weekly_other_class_hours = 0.0
-    for key in ("prop", "svil", "fasce"):
-        students = int(
-            specials_data.get(key, {}).get(
-                "students", defaults_specials[key]["students"]
-            )
+    with col_left:
+        st.plotly_chart(
+            fig_bar,
+            config={"staticPlot": True, "displayModeBar": True},
+            width="stretch",
         )
-        duration = defaults_specials[key]["duration"]
-        if students > 0:
-            weekly_other_class_hours += ceil(students / min_students) * (
-                duration / 60.0
-            )
 
-    weekly_total_hours = (
-        weekly_individual_hours + weekly_solfeggio_hours + weekly_other_class_hours
+
+@st.fragment(key="dashboard")
+def render_dashboards():
+    model = st.session_state["model"]
+    settings = model["settings"]
+    render_dashboard(model["totals"])
+    render_dashboard_anno(
+        model["totals"], settings["contributi"], settings["costi_fissi"]
     )
-    saturation_pct = (
-        (weekly_total_hours / total_available_hours) * 100
-        if total_available_hours > 0
-        else 0.0
+
+
+@st.fragment(key="sensitivity")
+def render_sensitivity_section():
+    scenario = st.session_state["model"]["scenario"]
+    render_sensitivity(
+        scenario, scenario["min_students"], scenario["hourly_teacher_cost"]
     )
 
-    with col1:
-        st.write("**🔎 Dettaglio per pacchetto (10 lezioni)**:")
-        st.write(f"🕒 Ore totali per pacchetto: {tot_10['total_hours']:.2f} h")
-        st.write(
-            f"👨‍🏫 Costo docente (lezioni individuali totali): € {tot_10['individual_costs']:,.2f}"
-        )
-        st.write(
-            f"🎼 Costo solfeggio (classi) per pacchetto: € {tot_10['solfeggio_cost']:,.2f}"
-        )
-        st.write(
-            f"🎼 Costo altri corsi (classi di Prop,SviMus,MusInFas): € {tot_10['special_costs']:,.2f}"
-        )
-        st.write(f"🏷️ Totale costi per pacchetto: € {tot_10['total_costs']:,.2f}")
-        st.write(
-            f"💵 Ricavi totali (1 pacchetto = {LESSONS_PER_PACKAGE} lezioni): € {tot_10['total_revenue']:,.2f}"
-        )
-        st.write(
-            f"📉 Scostamento per pacchetto (ricavi - costi): € {tot_10['deviation']:,.2f}"
-        )
 
-    with col2:
-        st.write(
-            "**⏱️ Ore settimanali (effettive)** — max 1 lezione strumento/settimana e max 1 solfeggio a settimana"
+@st.fragment(key="monte_carlo")
+def render_monte_carlo_section():
+    render_monte_carlo(st.session_state["model"]["scenario"])
+
+
+@st.fragment(key="break_even")
+def render_break_even_section():
+    render_break_even(st.session_state["model"]["scenario"])
+
+
+@st.fragment(key="optimizer")
+def render_price_optimizer_section():
+    render_price_optimizer(st.session_state["model"]["scenario"])
+
+
+@st.fragment(key="classes")
+def render_class_summary():
+    tot_10 = st.session_state["model"]["totals"]
+    st.markdown("### 📚 Riepilogo Classi Formate")
+    with st.expander("🔢 riepilogo classi formate", expanded=False):
+        classi_df = memoized(
+            "class_summary",
+            canonical_key(
+                (
+                    tot_10["solfeggio_class_count_by_duration"],
+                    tot_10["group_class_count"],
+                )
+            ),
+            lambda: class_summary_frame(tot_10),
         )
-        st.write(
-            f"🎻 Ore individuali (strumento) per settimana: {weekly_individual_hours:.2f} h"
+        st.dataframe(
+            classi_df,
+            column_config={
+                "Numero classi": st.column_config.NumberColumn(format="%d"),
+            },
+            hide_index=True,
         )
-        st.write(
-            f"📚 Ore solfeggio in classe per settimana: {weekly_solfeggio_hours:.2f} h"
+
+
+@st.fragment(key="cost_summary")
+def render_cost_summary():
+    tot_10 = st.session_state["model"]["totals"]
+    total_available_hours = st.session_state["model"]["settings"][
+        "total_available_hours"
+    ]
+    st.markdown("### 📊 Riepilogo Costi, Ricavi e Ore")
+    with st.expander("📈 Riepilogo costi, ricavi e ore (dettaglio)", expanded=False):
+        col1, col2 = st.columns(2)
+        # ore settimanali dal risultato del motore (senza moltiplicare per num_lessons)
+        weekly_total_hours = tot_10["weekly_total_hours"]
+        saturation_pct = (
+            (weekly_total_hours / total_available_hours) * 100
+            if total_available_hours > 0
+            else 0.0
         )
-        st.write(
-            f"🧸 Ore altri corsi in classe per settimana: {weekly_other_class_hours:.2f} h"
+
+        with col1:
+            st.write("**🔎 Dettaglio per pacchetto (10 lezioni)**:")
+            st.write(f"🕒 Ore totali per pacchetto: {tot_10['total_hours']:.2f} h")
+            st.write(
+                f"👨‍🏫 Costo docente (lezioni individuali totali): € {tot_10['individual_costs']:,.2f}"
+            )
+            st.write(
+                f"🎼 Costo solfeggio (classi) per pacchetto: € {tot_10['solfeggio_cost']:,.2f}"
+            )
+            st.write(
+                f"🎼 Costo altri corsi (classi di Prop,SviMus,MusInFas): € {tot_10['special_costs']:,.2f}"
+            )
+            st.write(f"🏷️ Totale costi per pacchetto: € {tot_10['total_costs']:,.2f}")
+            st.write(
+                f"💵 Ricavi totali (1 pacchetto = {LESSONS_PER_PACKAGE} lezioni): € {tot_10['total_revenue']:,.2f}"
+            )
+            st.write(
+                f"📉 Scostamento per pacchetto (ricavi - costi): € {tot_10['deviation']:,.2f}"
+            )
+
+        with col2:
+            st.write(
+                "**⏱️ Ore settimanali (effettive)** — max 1 lezione strumento/settimana e max 1 solfeggio a settimana"
+            )
+            st.write(
+                f"🎻 Ore individuali (strumento) per settimana: {tot_10['weekly_individual_hours']:.2f} h"
+            )
+            st.write(
+                f"📚 Ore solfeggio in classe per settimana: {tot_10['weekly_solfeggio_hours']:.2f} h"
+            )
+            st.write(
+                f"🧸 Ore altri corsi in classe per settimana: {tot_10['weekly_other_class_hours']:.2f} h"
+            )
+            st.write(f"🔢 Ore totali richieste a settimana: {weekly_total_hours:.2f} h")
+            st.write(f"📅 Ore disponibili a settimana: {total_available_hours:.2f} h")
+            st.write(
+                f"📈 Percentuale di saturazione settimanale: {saturation_pct:.2f} %"
+            )
+
+
+@st.fragment(key="detail")
+def render_detail_section():
+    tot_10 = st.session_state["model"]["totals"]
+    render_detail_table(tot_10, canonical_key(tot_10["detail_rows"].columns()))
+
+
+@st.fragment(key="diagnostics")
+def render_diagnostics():
+    # in sidebar; rilanciato dopo ogni modifica agli input
+    memo = memo_stats()
+    st.caption(
+        f"🧠 Calcoli riusati {memo['hits']} volte, eseguiti {memo['misses']} "
+        f"(in memoria {memo['size']}/{memo['maxsize']})"
+    )
+    model_graph = st.session_state["model_graph"]
+    recomputed = model_graph.last_recomputed
+    with st.expander(
+        f"🔬 Nodi ricalcolati: {len(recomputed)} / {len(model_graph.nodes)}"
+    ):
+        st.caption(", ".join(recomputed) if recomputed else "Nessun input cambiato.")
+
+
+# ----------------------------
+# LOGICA STREAMLIT (esecuzione)
+# ----------------------------
+with st.spinner("📥 Lettura dei dati..."):
+    try:
+        snapshot = load_defaults()
+    except Exception as e:
+        st.error(
+            f"Impossibile leggere i dati dal foglio e nessuna copia locale disponibile: {e}"
         )
-        st.write(f"🔢 Ore totali richieste a settimana: {weekly_total_hours:.2f} h")
-        st.write(f"📅 Ore disponibili a settimana: {total_available_hours:.2f} h")
-        st.write(f"📈 Percentuale di saturazione settimanale: {saturation_pct:.2f} %")
+        st.stop()
+default_enrollments = snapshot["default_enrollments"]
+# un corso speciale scartato dal foglio (vedi celle ignorate) parte da 0 iscritti
+defaults_specials = {
+    k: {"students": 0, "duration": 60, "price": 100} for k in SPECIAL_KEYS
+} | snapshot["defaults_specials"]
+render_data_status(snapshot)
+(
+    min_students,
+    hourly_teacher_cost,
+    total_available_hours,
+    contributi,
+    costi_fissi,
+) = render_sidebar_settings()
+render_inputs(default_enrollments, defaults_specials)
+
+# calcoli per pacchetto 10 lezioni: grafo del modello per sessione, ricalcola
+# solo i nodi a valle degli input cambiati (anche nei callback degli input)
+update_model(
+    dict(
+        min_students=min_students,
+        hourly_teacher_cost=hourly_teacher_cost,
+        contributi=contributi,
+        costi_fissi=costi_fissi,
+        total_available_hours=total_available_hours,
+        defaults_specials=defaults_specials,
+    )
+)
+
+# ----------------------------
+# GRAFICI: barre + semicerchio (pie rimodulato)
+# ----------------------------
+render_charts()
+render_dashboards()
+render_sensitivity_section()
+render_monte_carlo_section()
+render_break_even_section()
+render_price_optimizer_section()
+
+# -----------------------------
+# RIEPILOGO CLASSI e DETTAGLIO
+# -----------------------------
+render_class_summary()
+render_cost_summary()
+render_detail_section()
 
-render_detail_table(tot_10)
+with st.sidebar:
+    render_diagnostics()
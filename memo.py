@@ -0,0 +1,90 @@
+"""Memoizzazione delle tabelle derivate tra un rerun e l'altro.
+
+I totali sono ricalcolati in modo incrementale dal grafo della sessione
+(model_graph.py); qui le tabelle costruite dai suoi nodi (dettaglio per corso,
+classi formate) sono conservate in una cache LRU di dimensione limitata, con
+chiave canonica costruita dai nodi da cui dipendono. Tornare a uno scenario
+recente (es. annullare una modifica) riusa la tabella.
+
+La cache è condivisa tra le sessioni del processo: i valori restituiti sono
+gli stessi oggetti per tutti e non vanno modificati.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+MEMO_SIZE = int(os.getenv("TABLE_MEMO_SIZE", "64"))
+
+
+def canonical_key(value):
+    """
+    Forma hashable e indipendente dall'ordine di dict e insiemi, per usare
+    gli input (iscritti, speciali, prezzi, impostazioni) come chiave di cache.
+    """
+    if isinstance(value, dict):
+        items = ((canonical_key(k), canonical_key(v)) for k, v in value.items())
+        return ("dict", tuple(sorted(items, key=repr)))
+    if isinstance(value, (set, frozenset)):
+        return ("set", tuple(sorted((canonical_key(v) for v in value), key=repr)))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical_key(v) for v in value)
+    if hasattr(value, "item"):
+        # scalari numpy (es. valori letti da array)
+        return value.item()
+    return value
+
+
+class LRUCache:
+    """Cache LRU thread-safe con contatori di riusi (hit) e calcoli (miss)."""
+
+    def __init__(self, maxsize=MEMO_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, fn):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        # calcolo fuori dal lock: sessioni diverse non si bloccano a vicenda
+        value = fn()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_memo = LRUCache()
+
+
+def memoized(name, key, fn):
+    """Risultato di fn() per (name, key), calcolato solo al primo uso."""
+    return _memo.get_or_compute((name, key), fn)
+
+
+def memo_stats():
+    return _memo.stats()
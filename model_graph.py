@@ -0,0 +1,348 @@
+"""Modello di calcolo come grafo di dipendenze, ricalcolato in modo incrementale.
+
+Ogni nodo è una funzione pura dei suoi nodi padre; gli input sono foglie
+granulari (un nodo per iscritti e prezzo di ogni durata × corso, uno per ogni
+corso speciale, uno per ogni impostazione della sidebar):
+
+    prezzo, iscritti → riga di ricavo → total_revenue → deviation
+    iscritti → ore individuali / studenti solfeggio → classi → ore → costi
+    righe di ricavo + classi + costo orario → righe di dettaglio (costo, saldo)
+    sidebar (min_students, costo orario, ore disponibili) → classi, costi, saturazione
+
+update() confronta i nuovi input con i precedenti e ricalcola solo i nodi a
+valle di quelli cambiati; se un nodo ricalcolato ha lo stesso valore di prima
+la propagazione si ferma lì. I totali coincidono con engine.compute_totals
+(stesse operazioni nello stesso ordine).
+"""
+
+from engine import (
+    DEFAULT_PRICES_BY_MIN,
+    DURATIONS,
+    GROUP_SPECIALS,
+    INDIVIDUAL_COURSES,
+    LESSONS_PER_PACKAGE,
+    SOLFEGGIO_COURSES,
+    SPECIAL_KEYS,
+    DetailRows,
+    allocated_hours,
+    class_count,
+    courses,
+)
+
+COURSE_KEYS = tuple(key for key, _ in courses)
+CELLS = tuple((d, k) for d in DURATIONS for k in COURSE_KEYS)
+
+
+class DependencyGraph:
+    """Grafo di nodi (nome, dipendenze, funzione) valutato in ordine di inserimento."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.values = {}
+        self.last_recomputed = []
+        self.last_changed = set()
+
+    def add(self, name, deps, fn):
+        # i nodi vanno aggiunti dopo le loro dipendenze (ordine topologico)
+        unknown = [
+            d for d in deps if d not in self.nodes and not d.startswith("input:")
+        ]
+        assert not unknown, f"dipendenze non definite per {name}: {unknown}"
+        self.nodes[name] = (tuple(deps), fn)
+
+    def update(self, inputs):
+        """
+        Aggiorna gli input (nome senza prefisso "input:") e ricalcola i nodi
+        interessati; last_changed contiene input e nodi con un valore nuovo.
+        """
+        changed = set()
+        for key, value in inputs.items():
+            name = f"input:{key}"
+            if name not in self.values or self.values[name] != value:
+                self.values[name] = value
+                changed.add(name)
+
+        recomputed = []
+        for name, (deps, fn) in self.nodes.items():
+            if name in self.values and changed.isdisjoint(deps):
+                continue
+            value = fn(*(self.values[d] for d in deps))
+            recomputed.append(name)
+            if name not in self.values or self.values[name] != value:
+                self.values[name] = value
+                changed.add(name)
+        self.last_recomputed = recomputed
+        self.last_changed = changed
+        return self.values
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+
+# ----------------------------
+# INPUT
+# ----------------------------
+def graph_inputs(
+    enrolls,
+    specials,
+    specials_data,
+    price_overrides,
+    min_students,
+    hourly_teacher_cost,
+    total_available_hours,
+    num_lessons=LESSONS_PER_PACKAGE,
+    defaults_specials=None,
+    **_ignored,
+):
+    """Input di compute_totals scomposti nelle foglie del grafo."""
+    defaults_specials = defaults_specials or {}
+    inputs = {
+        "min_students": min_students,
+        "hourly_teacher_cost": hourly_teacher_cost,
+        "total_available_hours": total_available_hours,
+        "num_lessons": num_lessons,
+    }
+    for d, k in CELLS:
+        inputs[f"enroll:{d}:{k}"] = enrolls.get((d, k), 0)
+        inputs[f"price:{d}:{k}"] = price_overrides.get((d, k), DEFAULT_PRICES_BY_MIN[d])
+    for k in SPECIAL_KEYS:
+        meta = specials_data.get(k, {})
+        default = defaults_specials.get(k, {})
+        inputs[f"special:{k}"] = specials.get(k, 0)
+        inputs[f"special_price:{k}"] = meta.get("price", default.get("price", 0.0))
+        inputs[f"special_duration:{k}"] = meta.get(
+            "duration", default.get("duration", 60)
+        )
+    return inputs
+
+
+# ----------------------------
+# NODI
+# ----------------------------
+def _row(key, duration, n_students, price, num_lessons):
+    # riga di dettaglio come tupla nell'ordine di DETAIL_FIELDS (ricavo in coda)
+    return (
+        key,
+        duration,
+        n_students,
+        price,
+        n_students * price * (num_lessons / LESSONS_PER_PACKAGE),
+    )
+
+
+def _sum_revenue(*rows):
+    total = 0.0
+    for row in rows:
+        if row is not None:
+            total += row[-1]
+    return total
+
+
+def _detail_rows(students, classes, group_classes, lessons, hourly, *rows):
+    detail_rows = DetailRows()
+    for row in rows:
+        if row is not None:
+            detail_rows.append(*row)
+    detail_rows.set_costs(
+        hourly * allocated_hours(key, d, n, students, classes, group_classes, lessons)
+        for key, d, n in zip(
+            detail_rows.course_label, detail_rows.duration_min, detail_rows.n_students
+        )
+    )
+    return detail_rows
+
+
+def _group_hours(counts, *durations, num_lessons=None):
+    # ore delle classi di prop, svil, fasce; settimanali se num_lessons è None
+    hours = 0.0
+    for count, duration in zip(counts.values(), durations):
+        if count > 0:
+            if num_lessons is None:
+                hours += count * (duration / 60.0)
+            else:
+                hours += count * (duration / 60.0) * num_lessons
+    return hours
+
+
+def _costs(hourly, individual_hours, group_hours, solfeggio_hours):
+    teacher_cost = hourly * (individual_hours + group_hours)
+    solfeggio_cost = hourly * solfeggio_hours
+    return {
+        "individual_costs": hourly * individual_hours,
+        "special_costs": hourly * group_hours,
+        "solfeggio_cost": solfeggio_cost,
+        "total_costs": teacher_cost + solfeggio_cost,
+        "teacher_cost": teacher_cost,
+    }
+
+
+# chiave del risultato di compute_totals → nodo del grafo ("costs" è un dict)
+TOTALS_NODES = {
+    "total_revenue": "total_revenue",
+    "total_hours": "total_hours",
+    "total_week_hours": "total_week_hours",
+    "saturation": "saturation",
+    "deviation": "deviation",
+    "detail_rows": "detail_rows",
+    "solfeggio_class_count_by_duration": "solfeggio_class_count_by_duration",
+    "individual_hours": "individual_hours",
+    "solfeggio_class_hours": "solfeggio_hours",
+    "other_class_hours": "group_hours",
+    "solfeggio_students_by_duration": "solfeggio_students_by_duration",
+    "group_class_count": "group_class_count",
+    "weekly_individual_hours": "weekly_individual_hours",
+    "weekly_solfeggio_hours": "weekly_solfeggio_hours",
+    "weekly_other_class_hours": "weekly_group_hours",
+    "weekly_total_hours": "weekly_total_hours",
+}
+
+
+def build_totals_graph():
+    """Grafo del modello per un pacchetto di lezioni (stesso risultato di compute_totals)."""
+    g = DependencyGraph()
+
+    # righe di ricavo: una per cella durata × corso, una per corso speciale
+    for d, k in CELLS:
+        g.add(
+            f"row:{d}:{k}",
+            [f"input:enroll:{d}:{k}", f"input:price:{d}:{k}", "input:num_lessons"],
+            lambda n, price, lessons, d=d, k=k: _row(k, d, n, price, lessons),
+        )
+    for k in SPECIAL_KEYS:
+        g.add(
+            f"special_row:{k}",
+            [
+                f"input:special:{k}",
+                f"input:special_price:{k}",
+                f"input:special_duration:{k}",
+                "input:num_lessons",
+            ],
+            lambda n, price, duration, lessons, k=k: (
+                _row(k, duration, n, price, lessons) if n > 0 else None
+            ),
+        )
+    rows = [f"row:{d}:{k}" for d, k in CELLS] + [
+        f"special_row:{k}" for k in SPECIAL_KEYS
+    ]
+    g.add("total_revenue", rows, _sum_revenue)
+
+    # ore individuali (per pacchetto e settimanali)
+    individual = [(d, k) for d, k in CELLS if k in INDIVIDUAL_COURSES]
+    individual_deps = [f"input:enroll:{d}:{k}" for d, k in individual]
+    g.add(
+        "individual_hours",
+        ["input:num_lessons"] + individual_deps,
+        lambda lessons, *n: sum(
+            int(x) * (d / 60.0) * lessons for (d, _), x in zip(individual, n)
+        ),
+    )
+    g.add(
+        "weekly_individual_hours",
+        individual_deps,
+        lambda *n: sum(int(x) * (d / 60.0) for (d, _), x in zip(individual, n)),
+    )
+
+    # solfeggio: studenti per durata → classi → ore
+    for d in DURATIONS:
+        deps = [f"input:enroll:{d}:{k}" for k in SOLFEGGIO_COURSES]
+        if d == 60:
+            deps.append("input:special:solo_solfeggio")
+        g.add(f"solfeggio_students:{d}", deps, lambda *n: sum(int(x) for x in n))
+        g.add(
+            f"solfeggio_classes:{d}",
+            [f"solfeggio_students:{d}", "input:min_students"],
+            class_count,
+        )
+    g.add(
+        "solfeggio_students_by_duration",
+        [f"solfeggio_students:{d}" for d in DURATIONS],
+        lambda *students: dict(zip(DURATIONS, students)),
+    )
+    g.add(
+        "solfeggio_class_count_by_duration",
+        [f"solfeggio_classes:{d}" for d in DURATIONS],
+        lambda *counts: dict(zip(DURATIONS, counts)),
+    )
+    g.add(
+        "solfeggio_hours",
+        ["solfeggio_class_count_by_duration", "input:num_lessons"],
+        lambda counts, lessons: sum(c * 1.0 * lessons for c in counts.values()),
+    )
+    g.add(
+        "weekly_solfeggio_hours",
+        ["solfeggio_class_count_by_duration"],
+        lambda counts: sum(c * 1.0 for c in counts.values()),
+    )
+
+    # classi di prop, svil, fasce → ore
+    g.add(
+        "group_class_count",
+        [f"input:special:{k}" for k in GROUP_SPECIALS] + ["input:min_students"],
+        lambda *args: {
+            k: class_count(int(n), args[-1]) for k, n in zip(GROUP_SPECIALS, args)
+        },
+    )
+    group_durations = [f"input:special_duration:{k}" for k in GROUP_SPECIALS]
+    g.add(
+        "group_hours",
+        ["group_class_count", "input:num_lessons"] + group_durations,
+        lambda counts, lessons, *durations: _group_hours(
+            counts, *durations, num_lessons=lessons
+        ),
+    )
+    g.add("weekly_group_hours", ["group_class_count"] + group_durations, _group_hours)
+
+    g.add(
+        "total_hours",
+        ["individual_hours", "solfeggio_hours", "group_hours"],
+        lambda ind, solf, other: ind + solf + other,
+    )
+    g.add(
+        "weekly_total_hours",
+        ["weekly_individual_hours", "weekly_solfeggio_hours", "weekly_group_hours"],
+        lambda ind, solf, other: ind + solf + other,
+    )
+    g.add(
+        "total_week_hours",
+        ["total_hours"],
+        lambda h: h / LESSONS_PER_PACKAGE if LESSONS_PER_PACKAGE else h,
+    )
+    g.add(
+        "costs",
+        [
+            "input:hourly_teacher_cost",
+            "individual_hours",
+            "group_hours",
+            "solfeggio_hours",
+        ],
+        _costs,
+    )
+    # righe di dettaglio con il costo docente attribuito a ogni corso
+    g.add(
+        "detail_rows",
+        [
+            "solfeggio_students_by_duration",
+            "solfeggio_class_count_by_duration",
+            "group_class_count",
+            "input:num_lessons",
+            "input:hourly_teacher_cost",
+        ]
+        + rows,
+        _detail_rows,
+    )
+    g.add(
+        "deviation",
+        ["total_revenue", "costs"],
+        lambda revenue, costs: revenue - costs["total_costs"],
+    )
+    g.add(
+        "saturation",
+        ["total_week_hours", "input:total_available_hours"],
+        lambda week, available: (week / available) * 100 if available > 0 else 0.0,
+    )
+    g.add(
+        "totals",
+        ["costs"] + list(TOTALS_NODES.values()),
+        lambda costs, *values: dict(zip(TOTALS_NODES, values)) | costs,
+    )
+    return g
@@ -0,0 +1,206 @@
+"""Simulazione Monte Carlo dell'incertezza sugli iscritti.
+
+Gli iscritti del foglio sono previsioni: qui vengono estratti a caso per ogni
+(durata, corso) e per ogni corso speciale (Poisson, oppure uniformi in un
+intervallo scelto per corso), e ogni estrazione passa nel modello
+di costo vettoriale (vector_engine.evaluate). Il risultato è la distribuzione
+del risultato netto annuo (come in render_dashboard_anno).
+
+Le estrazioni sono elaborate a blocchi: di ogni blocco si conserva solo un
+istogramma a bin fissi, quindi la memoria non cresce con il numero di
+estrazioni, e la simulazione si ferma prima quando i percentili si stabilizzano.
+"""
+
+import numpy as np
+
+from engine import SPECIAL_KEYS, annual_result
+from vector_engine import COURSE_KEYS, evaluate
+
+PERCENTILES = (5, 25, 50, 75, 95)
+DISTRIBUTIONS = ("poisson", "range")
+HISTOGRAM_BINS = 2048
+
+
+# ----------------------------
+# ESTRAZIONI
+# ----------------------------
+def relative_ranges(values, low, high):
+    """
+    Intervalli [n·(1+low), n·(1+high)] arrotondati agli interi; low e high
+    sono variazioni relative (es. -0.2, 0.1), scalari o una per colonna.
+    """
+    values = np.asarray(values, dtype=float)
+    lo = np.floor(values * (1 + np.asarray(low))).clip(min=0)
+    hi = np.ceil(values * (1 + np.asarray(high))).clip(min=lo)
+    return lo.astype(np.int64), hi.astype(np.int64)
+
+
+def course_bounds(keys, ranges, spread):
+    """
+    Variazioni relative (basse, alte) per ogni chiave di keys: da ranges
+    ({corso: (low, high)}), altrimenti ±spread.
+    """
+    ranges = ranges or {}
+    bounds = [ranges.get(k, (-spread, spread)) for k in keys]
+    return (
+        np.array([low for low, _ in bounds], dtype=float),
+        np.array([high for _, high in bounds], dtype=float),
+    )
+
+
+def draw_students(rng, values, size, distribution="poisson", ranges=None):
+    """
+    size estrazioni degli iscritti (forma (size, *values.shape)).
+    poisson: media = valore previsto; range: intero uniforme in ranges=(low, high)
+    (estremi inclusi, per cella).
+    """
+    values = np.asarray(values)
+    shape = (size,) + values.shape
+    if distribution == "poisson":
+        return rng.poisson(values, size=shape)
+    if distribution == "range":
+        low, high = ranges
+        return rng.integers(low, np.asarray(high) + 1, size=shape)
+    raise ValueError(f"Distribuzione non supportata: {distribution}")
+
+
+# ----------------------------
+# ISTOGRAMMA A BLOCCHI
+# ----------------------------
+class StreamingHistogram:
+    """
+    Istogramma a bin fissi, aggiornato blocco per blocco. I bin sono fissati
+    sul primo blocco (allargati del 50% per lato); i valori fuori intervallo
+    finiscono nei bin estremi, mentre minimo e massimo veri restano esatti.
+    """
+
+    def __init__(self, bins=HISTOGRAM_BINS):
+        self.bins = bins
+        self.edges = None
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.losses = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        if self.edges is None:
+            lo, hi = float(values.min()), float(values.max())
+            margin = max(hi - lo, 1.0) * 0.5
+            self.edges = np.linspace(lo - margin, hi + margin, self.bins + 1)
+        idx = np.searchsorted(self.edges, values, side="right") - 1
+        self.counts += np.bincount(idx.clip(0, self.bins - 1), minlength=self.bins)
+        self.count += values.size
+        self.total += float(values.sum())
+        self.losses += int((values < 0).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def percentiles(self, qs=PERCENTILES):
+        """Percentili per interpolazione lineare dentro il bin."""
+        cum = np.cumsum(self.counts)
+        result = {}
+        for q in qs:
+            target = q / 100 * self.count
+            i = min(int(np.searchsorted(cum, target)), self.bins - 1)
+            before = cum[i - 1] if i > 0 else 0
+            frac = (target - before) / self.counts[i] if self.counts[i] else 0.0
+            value = self.edges[i] + frac * (self.edges[i + 1] - self.edges[i])
+            result[q] = float(min(max(value, self.min), self.max))
+        return result
+
+    def summary(self):
+        return {
+            "draws": self.count,
+            "mean": self.total / self.count,
+            "p_loss": self.losses / self.count,
+            "percentiles": self.percentiles(),
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+# ----------------------------
+# SIMULAZIONE
+# ----------------------------
+def run_monte_carlo(
+    batch,
+    draws=1_000_000,
+    chunk_size=50_000,
+    distribution="poisson",
+    spread=0.2,
+    ranges=None,
+    seed=None,
+    tol=0.002,
+    min_draws=200_000,
+    progress=None,
+):
+    """
+    batch: array di uno scenario (vector_engine.stack_scenarios): gli iscritti
+    sono la previsione, il resto resta fisso. Con distribution="range" gli
+    iscritti di ogni corso variano nell'intervallo relativo ranges[corso] =
+    (low, high) (chiavi di courses e SPECIAL_KEYS; es. (-0.3, 0.1)), per i
+    corsi assenti di ±spread. Si ferma dopo `draws` estrazioni o, superate `min_draws`,
+    quando percentili e probabilità di perdita cambiano meno di tol (relativo
+    all'intervallo P5-P95) tra due blocchi consecutivi.
+    progress(fatte, totali, riepilogo) è chiamata dopo ogni blocco.
+
+    Restituisce il riepilogo (draws, mean, p_loss, percentiles, min, max) più
+    converged e l'istogramma (edges, counts).
+    """
+    rng = np.random.default_rng(seed)
+    enrollments = batch["enrollments"][0]
+    special_students = batch["special_students"][0]
+    enroll_ranges = special_ranges = None
+    if distribution == "range":
+        # colonne della griglia = corsi (COURSE_KEYS), speciali in SPECIAL_KEYS
+        enroll_ranges = relative_ranges(
+            enrollments, *course_bounds(COURSE_KEYS, ranges, spread)
+        )
+        special_ranges = relative_ranges(
+            special_students, *course_bounds(SPECIAL_KEYS, ranges, spread)
+        )
+
+    hist = StreamingHistogram()
+    previous = None
+    converged = False
+    while hist.count < draws:
+        size = min(chunk_size, draws - hist.count)
+        res = evaluate(
+            draw_students(rng, enrollments, size, distribution, enroll_ranges),
+            batch["prices"],
+            draw_students(rng, special_students, size, distribution, special_ranges),
+            batch["special_prices"],
+            batch["special_durations"],
+            batch["min_students"],
+            batch["hourly_teacher_cost"],
+            batch["total_available_hours"],
+        )
+        hist.add(
+            annual_result(
+                res["total_revenue"],
+                res["total_costs"],
+                batch["contributi"],
+                batch["costi_fissi"],
+            )
+        )
+        summary = hist.summary()
+        if progress is not None:
+            progress(hist.count, draws, summary)
+
+        if previous is not None and hist.count >= min_draws:
+            pct, prev_pct = summary["percentiles"], previous["percentiles"]
+            scale = max(pct[95] - pct[5], 1.0)
+            shift = max(abs(pct[q] - prev_pct[q]) for q in PERCENTILES) / scale
+            if shift < tol and abs(summary["p_loss"] - previous["p_loss"]) < tol:
+                converged = True
+                break
+        previous = summary
+
+    return dict(
+        hist.summary(),
+        converged=converged,
+        edges=hist.edges,
+        counts=hist.counts,
+    )
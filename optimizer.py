@@ -0,0 +1,123 @@
+"""Prezzi suggeriti: massimo margine con il vincolo delle ore settimanali.
+
+Ottimizza i 12 prezzi dei corsi principali (durate × corsi) entro limiti
+fissati dall'utente, con un'elasticità facoltativa per corso: gli iscritti
+attesi al nuovo prezzo sono n · (prezzo / prezzo attuale) ^ -elasticità,
+arrotondati all'intero. Il margine è la deviazione per pacchetto (ricavi -
+costi); le proposte che superano le ore settimanali disponibili sono scartate.
+
+Ricerca per coordinate: a ogni passo un prezzo varia su tutta la sua griglia
+mentre gli altri restano fermi, e tutte le alternative sono valutate insieme
+con vector_engine.evaluate. Si ripete finché nessun prezzo migliora il margine.
+"""
+
+import numpy as np
+
+from engine import DURATIONS
+from vector_engine import COURSE_KEYS, evaluate
+
+GRID_STEPS = 25
+MAX_SWEEPS = 10
+# punteggio delle proposte che superano le ore disponibili
+INFEASIBLE = -1e12
+
+
+def expected_enrollments(enrollments, prices, base_prices, elasticity):
+    """Iscritti attesi ai nuovi prezzi (elasticità costante per corso)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(base_prices > 0, prices / base_prices, 1.0)
+    return np.rint(enrollments * ratio ** -np.asarray(elasticity)).astype(np.int64)
+
+
+def price_grid(low, high, current, steps=GRID_STEPS):
+    """
+    Prezzi candidati per cella: griglia a euro interi tra low e high più il
+    prezzo attuale se rientra nei limiti (altrimenti il limite più vicino).
+    """
+    grid = np.linspace(low, high, steps, axis=-1).round()
+    grid = np.clip(grid, low[..., None], high[..., None])
+    return np.concatenate([grid, np.clip(current, low, high)[..., None]], axis=-1)
+
+
+def optimize_prices(batch, low, high, elasticity=0.0, steps=GRID_STEPS):
+    """
+    batch: array di uno scenario (vector_engine.stack_scenarios); low/high:
+    limiti dei prezzi (durate × corsi); elasticity: numero o array per corso.
+
+    Restituisce prezzi e iscritti proposti, il riepilogo attuale/proposto
+    (deviation, total_week_hours, total_revenue, total_costs) e il numero di
+    passate e di scenari valutati.
+    """
+    base_prices = batch["prices"][0]
+    base_enrollments = batch["enrollments"][0]
+    available = batch["total_available_hours"]
+    low = np.broadcast_to(np.asarray(low, dtype=float), base_prices.shape)
+    high = np.maximum(np.asarray(high, dtype=float), low)
+    grid = price_grid(low, high, base_prices, steps)
+
+    def run(prices):
+        enrollments = expected_enrollments(
+            base_enrollments, prices, base_prices, elasticity
+        )
+        res = evaluate(
+            enrollments,
+            prices,
+            batch["special_students"],
+            batch["special_prices"],
+            batch["special_durations"],
+            batch["min_students"],
+            batch["hourly_teacher_cost"],
+            available,
+        )
+        return enrollments, res
+
+    def score(prices):
+        _, res = run(prices)
+        return np.where(
+            res["total_week_hours"] <= available,
+            res["deviation"],
+            INFEASIBLE - res["total_week_hours"],
+        )
+
+    # la ricerca parte dai prezzi attuali riportati entro i limiti
+    current = np.clip(base_prices, low, high)
+    current_score = score(current[None])[0]
+    evaluations, sweeps = 1, 0
+    while sweeps < MAX_SWEEPS:
+        sweeps += 1
+        improved = False
+        for d, c in np.ndindex(current.shape):
+            candidates = np.repeat(current[None], grid.shape[-1], axis=0)
+            candidates[:, d, c] = grid[d, c]
+            scores = score(candidates)
+            evaluations += len(candidates)
+            best = int(np.argmax(scores))
+            if scores[best] > current_score + 1e-9:
+                current, current_score = candidates[best], scores[best]
+                improved = True
+        if not improved:
+            break
+
+    def summary(prices):
+        enrollments, res = run(prices[None])
+        return enrollments[0], {
+            key: float(res[key][0])
+            for key in ("deviation", "total_week_hours", "total_revenue", "total_costs")
+        }
+
+    _, before = summary(base_prices)
+    enrollments, after = summary(current)
+    return {
+        "prices": current,
+        "enrollments": enrollments,
+        "price_overrides": {
+            (d, k): float(current[i, j])
+            for i, d in enumerate(DURATIONS)
+            for j, k in enumerate(COURSE_KEYS)
+        },
+        "current": before,
+        "proposed": after,
+        "feasible": after["total_week_hours"] <= float(np.squeeze(available)),
+        "sweeps": sweeps,
+        "evaluations": evaluations,
+    }
@@ -0,0 +1,216 @@
+"""Pareggio e risultato obiettivo sul modello di costo.
+
+Due domande, risolte senza ricalcoli a tentativi:
+- di quanto aumentare tutti i prezzi in modo uniforme perché il risultato
+  netto annuo (engine.annual_result) raggiunga l'obiettivo;
+- quanti allievi in più servono in ciascun corso per lo stesso obiettivo.
+
+Il risultato in funzione dell'aumento dei prezzi è lineare (i costi non
+dipendono dai prezzi). In funzione degli allievi aggiunti a un corso è lineare
+a tratti: ogni allievo porta il proprio margine, e ogni volta che si supera un
+multiplo di min_students si apre una classe (ceil) che costa un gradino fisso.
+I tratti sono risolti in forma chiusa; la soluzione trovata viene poi
+verificata con engine.compute_totals, che fornisce i totali esatti.
+"""
+
+from math import ceil
+
+from engine import (
+    DEFAULT_PRICES_BY_MIN,
+    GROUP_SPECIALS,
+    INDIVIDUAL_COURSES,
+    LESSONS_PER_PACKAGE,
+    PACKAGES_PER_YEAR,
+    SOLFEGGIO_COURSES,
+    annual_result,
+    class_count,
+    compute_totals,
+    solfeggio_students_by_duration,
+)
+
+# tentativi di correzione per l'arrotondamento in virgola mobile
+MAX_ADJUST = 4
+
+
+def scenario_result(scenario):
+    """Totali esatti e risultato netto annuo di uno scenario."""
+    totals = compute_totals(**scenario)
+    return totals, annual_result(
+        totals["total_revenue"],
+        totals["total_costs"],
+        scenario["contributi"],
+        scenario["costi_fissi"],
+    )
+
+
+# ----------------------------
+# AUMENTO UNIFORME DEI PREZZI
+# ----------------------------
+def scaled_prices(scenario, factor):
+    """Scenario con tutti i prezzi (corsi e speciali) moltiplicati per factor."""
+    defaults_specials = scenario.get("defaults_specials") or {}
+    price_overrides = {
+        key: scenario["price_overrides"].get(key, DEFAULT_PRICES_BY_MIN[key[0]])
+        * factor
+        for key in scenario["enrolls"]
+    }
+    specials_data = {
+        k: dict(
+            meta,
+            price=meta.get("price", defaults_specials.get(k, {}).get("price", 0.0))
+            * factor,
+        )
+        for k, meta in scenario["specials_data"].items()
+    }
+    return dict(scenario, price_overrides=price_overrides, specials_data=specials_data)
+
+
+def break_even_price(scenario, target=0.0, step=0.001):
+    """
+    Aumento uniforme minimo dei prezzi (0.05 = +5%, arrotondato per eccesso a
+    `step`) per avere risultato netto annuo >= target. Con un risultato già
+    sopra l'obiettivo l'aumento è negativo (margine di riduzione).
+    Restituisce None se non ci sono ricavi su cui agire.
+    """
+    totals, result = scenario_result(scenario)
+    revenue = PACKAGES_PER_YEAR * totals["total_revenue"]
+    if revenue <= 0:
+        return None
+
+    # risultato(x) = risultato(0) + ricavi annui · x
+    increase = ceil((target - result) / revenue / step) * step
+    for _ in range(MAX_ADJUST):
+        solved = scaled_prices(scenario, 1 + increase)
+        new_totals, new_result = scenario_result(solved)
+        if new_result >= target:
+            break
+        increase += step
+    return {
+        "increase": increase,
+        "annual_result": new_result,
+        "totals": new_totals,
+        "price_overrides": solved["price_overrides"],
+    }
+
+
+# ----------------------------
+# ALLIEVI IN PIÙ PER CORSO
+# ----------------------------
+def marginal_model(scenario, course, duration=None):
+    """
+    Modello annuo di un allievo in più: (margine per allievo, costo di una
+    nuova classe, allievi già nella classe interessata). Il costo classe è 0
+    per i corsi senza classi.
+    """
+    hourly = scenario["hourly_teacher_cost"]
+    enrolls, specials = scenario["enrolls"], scenario["specials"]
+    num_lessons = scenario.get("num_lessons", LESSONS_PER_PACKAGE)
+    ratio = num_lessons / LESSONS_PER_PACKAGE
+    class_cost, class_students = 0.0, 0
+
+    if duration is not None:
+        price = scenario["price_overrides"].get(
+            (duration, course), DEFAULT_PRICES_BY_MIN[duration]
+        )
+        margin = price * ratio
+        if course in INDIVIDUAL_COURSES:
+            margin -= hourly * (duration / 60.0) * num_lessons
+        if course in SOLFEGGIO_COURSES:
+            class_cost = hourly * 1.0 * num_lessons
+            class_students = solfeggio_students_by_duration(enrolls, specials)[duration]
+    else:
+        defaults = (scenario.get("defaults_specials") or {}).get(course, {})
+        meta = scenario["specials_data"].get(course, {})
+        margin = meta.get("price", defaults.get("price", 0.0)) * ratio
+        if course in GROUP_SPECIALS:
+            minutes = meta.get("duration", defaults.get("duration", 60))
+            class_cost = hourly * (minutes / 60.0) * num_lessons
+            class_students = int(specials.get(course, 0))
+        elif course == "solo_solfeggio":
+            class_cost = hourly * 1.0 * num_lessons
+            class_students = solfeggio_students_by_duration(enrolls, specials)[60]
+    return (
+        PACKAGES_PER_YEAR * margin,
+        PACKAGES_PER_YEAR * class_cost,
+        class_students,
+    )
+
+
+def min_extra_students(gap, margin, class_cost, students, min_students):
+    """
+    Minimo k >= 0 con margin·k - class_cost·(nuove classi) >= gap, dove le
+    nuove classi sono ceil((students + k) / min_students) - classi attuali.
+    None se l'obiettivo non è raggiungibile aggiungendo allievi.
+
+    Tratto j (j nuove classi) = k in (end(j-1), end(j)], con
+    end(j) = posti liberi + j·min_students; il risultato cresce dentro il
+    tratto e cala di class_cost all'apertura di ogni classe, quindi la prima
+    soluzione sta nel primo tratto il cui estremo destro raggiunge gap.
+    """
+    if gap <= 0:
+        return 0
+    if margin <= 0:
+        return None
+    if class_cost == 0:
+        return ceil(gap / margin)
+
+    free_seats = class_count(students, min_students) * min_students - students
+    end_gain = margin * free_seats
+    segment_gain = margin * min_students - class_cost
+    if end_gain >= gap:
+        j = 0
+    elif segment_gain <= 0:
+        return None
+    else:
+        j = ceil((gap - end_gain) / segment_gain)
+    start = 0 if j == 0 else free_seats + (j - 1) * min_students + 1
+    return max(start, ceil((gap + class_cost * j) / margin))
+
+
+def add_students(scenario, course, duration, extra):
+    """Scenario con `extra` allievi in più nel corso indicato."""
+    if duration is not None:
+        enrolls = dict(scenario["enrolls"])
+        enrolls[(duration, course)] = enrolls.get((duration, course), 0) + extra
+        return dict(scenario, enrolls=enrolls)
+    specials = dict(scenario["specials"])
+    specials[course] = specials.get(course, 0) + extra
+    specials_data = dict(scenario["specials_data"])
+    specials_data[course] = dict(
+        specials_data.get(course, {}), students=specials[course]
+    )
+    return dict(scenario, specials=specials, specials_data=specials_data)
+
+
+def break_even_students(scenario, target=0.0):
+    """
+    Per ogni corso (durata × corso principale e ogni corso speciale) il minimo
+    numero di allievi in più per avere risultato netto annuo >= target, con i
+    totali esatti risultanti. Lista ordinata per allievi necessari; i corsi in
+    cui aggiungere allievi non basta hanno extra_students None (in fondo).
+    """
+    _, result = scenario_result(scenario)
+    candidates = [(key, duration) for duration, key in scenario["enrolls"]]
+    candidates += [(k, None) for k in scenario["specials"]]
+
+    rows = []
+    for course, duration in candidates:
+        margin, class_cost, students = marginal_model(scenario, course, duration)
+        extra = min_extra_students(
+            target - result, margin, class_cost, students, scenario["min_students"]
+        )
+        row = {"course": course, "duration": duration, "extra_students": extra}
+        if extra is not None:
+            # verifica sul motore esatto (arrotondamenti in virgola mobile)
+            for _ in range(MAX_ADJUST):
+                totals, new_result = scenario_result(
+                    add_students(scenario, course, duration, extra)
+                )
+                if new_result >= target:
+                    break
+                extra += 1
+            row.update(extra_students=extra, annual_result=new_result, totals=totals)
+        rows.append(row)
+
+    rows.sort(key=lambda r: (r["extra_students"] is None, r["extra_students"] or 0))
+    return rows
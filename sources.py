@@ -0,0 +1,553 @@
+"""Sorgenti dati per i valori di default (iscritti e corsi speciali).
+
+Ogni sorgente restituisce gli stessi due blocchi "grezzi" del foglio Google
+(righe di celle, numeri già tipizzati come con UNFORMATTED_VALUE), che poi
+vengono interpretati in default_enrollments / defaults_specials:
+
+- GoogleSheetSource: il foglio Google condiviso (default)
+- FileSource: una copia locale del foglio in CSV o XLSX
+- SqliteSource: due tabelle in un database SQLite
+- FakeSheetSource: griglia in memoria che imita il foglio (test e benchmark)
+
+gspread e le credenziali servono solo alla sorgente Google e vengono
+importati al primo uso, così l'app può partire anche offline.
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()  # carica tutte le variabili da .env
+
+
+# CREDS_PATH = os.getenv("CREDS_PATH")
+SPREADSHEET_NAME = os.getenv("SPREADSHEET_NAME")
+SHEET_NAME = os.getenv("SHEET_NAME")
+ROWS = (1, 13)  # zero-based: start inclusive, end exclusive (es. righe 2-13)
+COLS = (7, 10)  # zero-based: colonne H-J (start inclusive, end exclusive)
+COL_NAMES = ["Durata", "Corso", "Iscritti"]
+
+# ----------------------------
+# COORDINATE per specials dal .env o fisse
+# ----------------------------
+SPECIAL_ROWS = (0, 5)  # righe 1-5 nel foglio → 0-based
+SPECIAL_COLS = (11, 15)  # colonne L-O → 0-based
+SPECIAL_COL_NAMES = ["Corso", "Studenti", "Durata", "Prezzo"]
+
+scope = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive",
+]
+
+
+def col_letter(idx):
+    """Indice di colonna zero-based → lettera A1 (0 → A, 26 → AA)."""
+    letters = ""
+    idx += 1
+    while idx > 0:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def a1_range(rows, cols):
+    """Coordinate zero-based (start incluso, end escluso) → intervallo A1."""
+    return f"{col_letter(cols[0])}{rows[0] + 1}:{col_letter(cols[1] - 1)}{rows[1]}"
+
+
+ENROLL_RANGE = a1_range(ROWS, COLS)  # es. H2:J13
+SPECIAL_RANGE = a1_range(SPECIAL_ROWS, SPECIAL_COLS)  # es. L1:O5
+
+
+# ----------------------------
+# INTERPRETAZIONE DEI BLOCCHI
+# ----------------------------
+class BlockColumns:
+    """
+    Blocco di celle (righe di lunghezza variabile) in forma colonnare:
+    per ogni colonna il valore grezzo, il testo ripulito e la versione numerica,
+    calcolati sull'intera colonna in un colpo solo.
+    """
+
+    def __init__(self, block, columns, origin):
+        self.columns = columns
+        self.origin = origin
+        values = pd.DataFrame(list(block), dtype=object)
+        values = values.reindex(columns=range(len(columns))).to_numpy(dtype=object)
+        missing = pd.isna(values)
+        self.raw = np.where(missing, "", values)
+        self.text = np.char.strip(self.raw.astype(str))
+        self.empty = self.text == ""
+        # righe di intestazione ripetute nel blocco (es. riga 1 dei corsi speciali)
+        self.header = (self.text == np.array(columns)).all(axis=1)
+        self.blank = self.empty.all(axis=1) | self.header
+
+    def idx(self, column):
+        return self.columns.index(column)
+
+    def str(self, column):
+        return self.text[:, self.idx(column)]
+
+    def num(self, column):
+        """Coercizione numerica della colonna (NaN per celle vuote o testuali)."""
+        j = self.idx(column)
+        raw = np.where(self.empty[:, j], np.nan, self.raw[:, j])
+        return pd.to_numeric(raw, errors="coerce").astype(float)
+
+    def reject(self, rejected, mask, column, reason):
+        """Aggiunge a `rejected` le celle di `column` selezionate da mask, con coordinate A1."""
+        if rejected is None:
+            return
+        j = self.idx(column)
+        col_name = col_letter(self.origin[1] + j)
+        for row in np.flatnonzero(mask & ~self.header):
+            rejected.append(
+                {
+                    "cell": f"{col_name}{self.origin[0] + row + 1}",
+                    "column": column,
+                    "value": self.raw[row, j],
+                    "reason": reason,
+                }
+            )
+
+    def check_numeric(self, rejected, column, values, required):
+        j = self.idx(column)
+        self.reject(
+            rejected, ~self.empty[:, j] & np.isnan(values), column, "non numerico"
+        )
+        if required:
+            self.reject(rejected, self.empty[:, j] & ~self.blank, column, "mancante")
+
+
+def parse_enrollments(block, rejected=None, origin=(ROWS[0], COLS[0])):
+    """
+    Costruisce default_enrollments con chiavi tuple (durata, corso).
+    Le celle scartate vengono aggiunte a `rejected` (se passato) con le
+    coordinate nel foglio; origin è l'angolo del blocco (zero-based).
+    """
+    b = BlockColumns(block, COL_NAMES, origin)
+    corso = b.str("Corso")
+    durata = b.num("Durata")
+    iscritti = b.num("Iscritti")
+
+    b.check_numeric(rejected, "Durata", durata, required=True)
+    b.check_numeric(rejected, "Iscritti", iscritti, required=True)
+    b.reject(rejected, (corso == "") & ~b.blank, "Corso", "mancante")
+
+    valid = ~np.isnan(durata) & ~np.isnan(iscritti) & (corso != "") & ~b.header
+    keys = zip(np.trunc(durata[valid]).astype(int).tolist(), corso[valid].tolist())
+    return dict(zip(keys, np.trunc(iscritti[valid]).astype(int).tolist()))
+
+
+def parse_specials(block, rejected=None, origin=(SPECIAL_ROWS[0], SPECIAL_COLS[0])):
+    """
+    Costruisce defaults_specials: {corso: {students, duration, price}}.
+    Durata e prezzo mancanti (o non numerici, che vengono segnalati) valgono 60 e 100.
+    """
+    b = BlockColumns(block, SPECIAL_COL_NAMES, origin)
+    corso = b.str("Corso")
+    students = b.num("Studenti")
+    durata = b.num("Durata")
+    prezzo = b.num("Prezzo")
+
+    b.check_numeric(rejected, "Studenti", students, required=True)
+    b.check_numeric(rejected, "Durata", durata, required=False)
+    b.check_numeric(rejected, "Prezzo", prezzo, required=False)
+    b.reject(rejected, (corso == "") & ~b.blank, "Corso", "mancante")
+
+    durata = np.trunc(np.nan_to_num(durata)).astype(int)
+    prezzo = np.nan_to_num(prezzo)
+
+    valid = (corso != "") & ~np.isnan(students) & ~b.header
+    return {
+        k: {"students": s, "duration": d, "price": p}
+        for k, s, d, p in zip(
+            corso[valid].tolist(),
+            np.trunc(students[valid]).astype(int).tolist(),
+            np.where(durata[valid] == 0, 60, durata[valid]).tolist(),
+            np.where(prezzo[valid] == 0, 100.0, prezzo[valid]).tolist(),
+        )
+    }
+
+
+def parse_blocks(enroll_block, special_block):
+    """Restituisce (default_enrollments, defaults_specials, rejected)."""
+    rejected = []
+    default_enrollments = parse_enrollments(enroll_block, rejected)
+    defaults_specials = parse_specials(special_block, rejected)
+    return default_enrollments, defaults_specials, rejected
+
+
+def to_number(x):
+    """Testo di una cella → int/float come farebbe UNFORMATTED_VALUE (altrimenti testo)."""
+    if not isinstance(x, str):
+        return x
+    s = x.strip()
+    try:
+        return int(s)
+    except ValueError:
+        pass
+    try:
+        return float(s)
+    except ValueError:
+        return s
+
+
+def slice_block(grid, rows, cols):
+    """Ritaglia un blocco dalla griglia togliendo celle e righe vuote in coda."""
+    block = []
+    for row in grid[rows[0] : rows[1]]:
+        values = list(row[cols[0] : cols[1]])
+        while values and values[-1] in ("", None):
+            values.pop()
+        block.append(values)
+    while block and not block[-1]:
+        block.pop()
+    return block
+
+
+def blocks_fingerprint(enroll_block, special_block):
+    """Impronta del contenuto letto: uguale se e solo se le celle sono le stesse."""
+    payload = json.dumps(
+        [enroll_block, special_block], separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------------------
+# SORGENTI
+# ----------------------------
+class DataSource:
+    """Interfaccia comune: fetch_blocks() scarica, load() interpreta."""
+
+    name = "sorgente"
+
+    def fetch_blocks(self):
+        """Restituisce (enroll_block, special_block) come liste di righe."""
+        raise NotImplementedError
+
+    def load(self):
+        """Restituisce (default_enrollments, defaults_specials, rejected)."""
+        return parse_blocks(*self.fetch_blocks())
+
+    def describe(self):
+        return self.name
+
+    def key(self):
+        """Identifica cosa viene letto: letture concorrenti con la stessa chiave si uniscono."""
+        return (type(self).__name__, self.name, ENROLL_RANGE, SPECIAL_RANGE)
+
+
+# ----------------------------
+# RETRY CON BACKOFF ESPONENZIALE
+# ----------------------------
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def is_retryable(exc):
+    """Errori di quota (429) o temporanei del server (5xx) dell'API Google."""
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) in RETRY_STATUS
+
+
+def retry_call(fn, retries=5, base_delay=1.0, max_delay=32.0, sleep=time.sleep):
+    """
+    Esegue fn() ritentando sugli errori di quota con attesa esponenziale
+    (1, 2, 4, ... s, con jitter); rispetta l'header Retry-After se presente.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = min(base_delay * 2**attempt, max_delay)
+            retry_after = getattr(e.response, "headers", {}).get("Retry-After")
+            if retry_after and str(retry_after).isdigit():
+                delay = max(delay, float(retry_after))
+            sleep(delay * random.uniform(0.5, 1.0))
+
+
+# Client e fogli sono condivisi da tutte le sessioni del processo: le credenziali
+# vengono lette una sola volta e il token OAuth viene rinnovato sul posto.
+_client = None
+_worksheets = {}  # (spreadsheet, sheet) → foglio di lavoro già aperto
+_client_lock = threading.RLock()
+
+# credenziali rifiutate o foglio non raggiungibile: client e fogli vanno ricreati
+RESET_STATUS = {401, 403, 404}
+
+
+def get_credentials():
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    # Provo a leggere il JSON dai secrets/cloud
+    creds_json = os.getenv("GOOGLE_CREDS_JSON")
+    if creds_json:
+        # Se esiste, siamo in cloud
+        creds_dict = json.loads(creds_json)
+        creds_dict["private_key"] = creds_dict["private_key"].replace("\\n", "\n")
+        return ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    # Se non esiste, siamo in locale: carico dal file fisico
+    CREDS_PATH = "credenziali.json"
+    return ServiceAccountCredentials.from_json_keyfile_name(CREDS_PATH, scope)
+
+
+def get_client():
+    """Client gspread condiviso (creato al primo uso, token sempre valido)."""
+    global _client
+    import gspread
+    from google.auth.transport.requests import Request
+
+    with _client_lock:
+        if _client is None:
+            _client = gspread.authorize(get_credentials())
+        creds = _client.http_client.auth
+        if not creds.valid:
+            # token scaduto o non ancora ottenuto: lo rinnovo senza ricreare il client
+            creds.refresh(Request())
+        return _client
+
+
+def get_worksheet(spreadsheet_name=None, sheet_name=None):
+    """
+    Foglio di lavoro condiviso, uno per (spreadsheet, foglio): client.open per
+    nome costa una ricerca su Drive e viene fatta solo al primo uso.
+    """
+    key = (spreadsheet_name or SPREADSHEET_NAME, sheet_name or SHEET_NAME)
+    with _client_lock:
+        sheet = _worksheets.get(key)
+    if sheet is None:
+        # apertura fuori dal lock: le letture di altri fogli non aspettano la
+        # ricerca su Drive; se due thread aprono lo stesso foglio vince il primo
+        sheet = get_client().open(key[0]).worksheet(key[1])
+        with _client_lock:
+            sheet = _worksheets.setdefault(key, sheet)
+    return sheet
+
+
+def needs_new_client(exc):
+    """Errori di autenticazione o foglio non trovato (non risolti da un retry)."""
+    import gspread
+    from google.auth.exceptions import RefreshError
+
+    if isinstance(
+        exc,
+        (
+            RefreshError,
+            gspread.exceptions.SpreadsheetNotFound,
+            gspread.exceptions.WorksheetNotFound,
+        ),
+    ):
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) in RESET_STATUS
+
+
+def reset_client():
+    """Scarta client e fogli condivisi: la prossima lettura li ricrea."""
+    global _client
+    with _client_lock:
+        _client = None
+        _worksheets.clear()
+
+
+class GoogleSheetSource(DataSource):
+    """Foglio Google: una sola richiesta batch dei due intervalli."""
+
+    def __init__(self, spreadsheet_name=None, sheet_name=None):
+        self.spreadsheet_name = spreadsheet_name or SPREADSHEET_NAME
+        self.sheet_name = sheet_name or SHEET_NAME
+        self.name = f"Google Sheets ({self.spreadsheet_name} / {self.sheet_name})"
+
+    def fetch_blocks(self):
+        """
+        Scarica in una sola richiesta (batch) solo i due blocchi che servono,
+        con valori non formattati: i numeri arrivano già come int/float.
+        """
+        import gspread
+
+        def batch_get():
+            sheet = get_worksheet(self.spreadsheet_name, self.sheet_name)
+            return sheet.batch_get(
+                [ENROLL_RANGE, SPECIAL_RANGE],
+                value_render_option=gspread.utils.ValueRenderOption.unformatted,
+            )
+
+        try:
+            enroll_block, special_block = retry_call(batch_get)
+        except Exception as e:
+            # credenziali cambiate o revocate, foglio rinominato: la prossima
+            # lettura riparte da client e foglio nuovi
+            if needs_new_client(e):
+                reset_client()
+            raise
+        return enroll_block, special_block
+
+
+class FakeSheetSource(DataSource):
+    """
+    Griglia in memoria con la stessa disposizione del foglio (liste di righe,
+    indici zero-based). Conta le letture in `calls`; `latency` (secondi)
+    simula il tempo di risposta dell'API.
+    """
+
+    name = "Foglio in memoria"
+
+    def __init__(self, grid=None, latency=0.0):
+        self.grid = grid if grid is not None else sample_grid()
+        self.latency = latency
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def fetch_blocks(self):
+        with self._calls_lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return (
+            slice_block(self.grid, ROWS, COLS),
+            slice_block(self.grid, SPECIAL_ROWS, SPECIAL_COLS),
+        )
+
+
+class FileSource(DataSource):
+    """Copia locale del foglio (.csv o .xlsx) con la stessa disposizione delle celle."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = f"File locale ({os.path.basename(path)})"
+
+    def read_grid(self):
+        if self.path.lower().endswith((".xlsx", ".xls")):
+            # richiede openpyxl
+            df = pd.read_excel(
+                self.path, header=None, dtype=str, sheet_name=SHEET_NAME or 0
+            )
+        else:
+            df = pd.read_csv(self.path, header=None, dtype=str, keep_default_na=False)
+        df = df.fillna("")
+        return [[to_number(x) for x in row] for row in df.values.tolist()]
+
+    def fetch_blocks(self):
+        grid = self.read_grid()
+        return (
+            slice_block(grid, ROWS, COLS),
+            slice_block(grid, SPECIAL_ROWS, SPECIAL_COLS),
+        )
+
+
+class SqliteSource(DataSource):
+    """
+    Database SQLite con le tabelle:
+    iscritti(durata, corso, iscritti) e corsi_speciali(corso, studenti, durata, prezzo).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.name = f"SQLite ({os.path.basename(path)})"
+
+    def fetch_blocks(self):
+        with sqlite3.connect(self.path) as conn:
+            enroll_block = conn.execute(
+                "SELECT durata, corso, iscritti FROM iscritti ORDER BY rowid"
+            ).fetchall()
+            special_block = conn.execute(
+                "SELECT corso, studenti, durata, prezzo FROM corsi_speciali ORDER BY rowid"
+            ).fetchall()
+        return [list(r) for r in enroll_block], [list(r) for r in special_block]
+
+    def write(self, default_enrollments, defaults_specials):
+        """Crea (o sovrascrive) le tabelle a partire dai default già interpretati."""
+        with sqlite3.connect(self.path) as conn:
+            conn.executescript("""
+                DROP TABLE IF EXISTS iscritti;
+                DROP TABLE IF EXISTS corsi_speciali;
+                CREATE TABLE iscritti (durata INTEGER, corso TEXT, iscritti INTEGER);
+                CREATE TABLE corsi_speciali
+                    (corso TEXT, studenti INTEGER, durata INTEGER, prezzo REAL);
+                """)
+            conn.executemany(
+                "INSERT INTO iscritti VALUES (?, ?, ?)",
+                [(d, c, n) for (d, c), n in default_enrollments.items()],
+            )
+            conn.executemany(
+                "INSERT INTO corsi_speciali VALUES (?, ?, ?, ?)",
+                [
+                    (k, v["students"], v["duration"], v["price"])
+                    for k, v in defaults_specials.items()
+                ],
+            )
+
+
+# ----------------------------
+# GRIGLIA DI ESEMPIO
+# ----------------------------
+SAMPLE_ENROLLMENTS = {
+    (30, "solo_fiato"): 1,
+    (30, "fiato_solf"): 12,
+    (30, "solo_arco"): 0,
+    (30, "arco_solf"): 13,
+    (45, "solo_fiato"): 9,
+    (45, "fiato_solf"): 16,
+    (45, "solo_arco"): 11,
+    (45, "arco_solf"): 11,
+    (60, "solo_fiato"): 8,
+    (60, "fiato_solf"): 4,
+    (60, "solo_arco"): 10,
+    (60, "arco_solf"): 2,
+}
+
+SAMPLE_SPECIALS = {
+    "prop": {"students": 0, "duration": 60, "price": 100},
+    "svil": {"students": 5, "duration": 45, "price": 80},
+    "fasce": {"students": 0, "duration": 30, "price": 80},
+    "solo_solfeggio": {"students": 12, "duration": 60, "price": 100},
+}
+
+
+def grid_from_defaults(
+    default_enrollments, defaults_specials, n_rows=None, n_cols=None
+):
+    """Griglia del foglio (con intestazioni) che contiene i default indicati."""
+    n_rows = max(n_rows or 0, ROWS[1], SPECIAL_ROWS[1])
+    n_cols = max(n_cols or 0, COLS[1], SPECIAL_COLS[1])
+    grid = [["" for _ in range(n_cols)] for _ in range(n_rows)]
+    grid[ROWS[0] - 1][COLS[0] : COLS[1]] = COL_NAMES
+    for i, ((d, c), n) in enumerate(default_enrollments.items()):
+        grid[ROWS[0] + i][COLS[0] : COLS[1]] = [d, c, n]
+    grid[SPECIAL_ROWS[0]][SPECIAL_COLS[0] : SPECIAL_COLS[1]] = SPECIAL_COL_NAMES
+    for i, (k, v) in enumerate(defaults_specials.items()):
+        grid[SPECIAL_ROWS[0] + 1 + i][SPECIAL_COLS[0] : SPECIAL_COLS[1]] = [
+            k,
+            v["students"],
+            v["duration"],
+            v["price"],
+        ]
+    return grid
+
+
+def sample_grid():
+    return grid_from_defaults(SAMPLE_ENROLLMENTS, SAMPLE_SPECIALS)
+
+
+def make_source(kind="google", path=None):
+    """Crea la sorgente indicata: google | csv | xlsx | file | sqlite | fake."""
+    kind = (kind or "google").lower()
+    if kind == "google":
+        return GoogleSheetSource()
+    if kind in ("csv", "xlsx", "file"):
+        return FileSource(path)
+    if kind == "sqlite":
+        return SqliteSource(path)
+    if kind in ("fake", "memoria"):
+        return FakeSheetSource()
+    raise ValueError(f"Sorgente dati sconosciuta: {kind}")
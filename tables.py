@@ -0,0 +1,113 @@
+"""Tabelle della pagina costruite dal risultato del motore (pandas + pyarrow).
+
+Le trasformazioni sono vettoriali: chiavi dei corsi come categorie, etichette
+da tabelle di lookup calcolate una volta per categoria, filtri con maschere
+booleane. Le colonne restano numeriche e con tipi Arrow (pd.ArrowDtype) dalla
+costruzione alla pagina: st.dataframe le serializza senza conversioni e la
+formattazione (euro, interi) la fa il widget con column_config.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from engine import DETAIL_FIELDS, SPECIAL_KEYS, SPECIAL_LABELS
+
+# corsi nascosti nella tabella di dettaglio (hanno classi proprie)
+HIDDEN_DETAIL_COURSES = frozenset(SPECIAL_KEYS)
+
+DETAIL_COURSE_LABELS = {
+    "solo_fiato": "Fiati",
+    "fiato_solf": "Fiati + Solfeggio",
+    "solo_arco": "Archi",
+    "arco_solf": "Archi + Solfeggio",
+    "prop": "Propedeutica",
+    "svil": "Sviluppo musicalità",
+    "fasce": "Musica in fasce",
+    "solo_solfeggio": "Solo Solfeggio",
+}
+
+DETAIL_HEADERS = {
+    "course_label": "Corso",
+    "duration_min": "Minuti",
+    "n_students": "Iscritti",
+    "price_per_10_lezioni": "Prezzo (€/pacchetto)",
+    "revenue_for_package": "Ricavo (€/pacchetto)",
+    "cost_per_package": "Costo (€/pacchetto)",
+    "saldo": "Saldo (€/pacchetto)",
+}
+# colonne in euro (formattate dal widget)
+DETAIL_MONEY_COLUMNS = tuple(
+    DETAIL_HEADERS[field]
+    for field in (
+        "price_per_10_lezioni",
+        "revenue_for_package",
+        "cost_per_package",
+        "saldo",
+    )
+)
+
+
+DETAIL_TYPES = {
+    "course_label": pa.string(),
+    "duration_min": pa.int64(),
+    "n_students": pa.int64(),
+    "price_per_10_lezioni": pa.float64(),
+    "revenue_for_package": pa.float64(),
+    "cost_per_package": pa.float64(),
+    "saldo": pa.float64(),
+}
+DETAIL_SCHEMA = pa.schema([(field, DETAIL_TYPES[field]) for field in DETAIL_FIELDS])
+
+
+def arrow_frame(columns, schema=None):
+    """DataFrame con colonne pd.ArrowDtype da {nome: valori} (liste o array)."""
+    return pa.table(columns, schema=schema).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def detail_table_frame(detail_rows):
+    """
+    Tabella di dettaglio per corso da engine.DetailRows: restituisce
+    (DataFrame con colonne DETAIL_HEADERS, None) oppure (None, messaggio).
+    """
+    df = arrow_frame(detail_rows.columns(), DETAIL_SCHEMA)
+    if df.empty:
+        return None, "Nessun corso con iscritti."
+
+    course = df["course_label"].astype("category")
+    visible = ~course.isin(HIDDEN_DETAIL_COURSES).to_numpy()
+    if not visible.any():
+        return (
+            None,
+            "Dopo aver nascosto i corsi selezionati non ci sono righe da mostrare.",
+        )
+    df = df[visible].reset_index(drop=True)
+    course = course[visible].reset_index(drop=True)
+
+    # etichetta leggibile "Nome (30')": calcolata una volta per coppia
+    # (corso, minuti) presente e poi distribuita sulle righe
+    names = [DETAIL_COURSE_LABELS.get(k, k) for k in course.cat.categories]
+    pair, pairs = pd.factorize(
+        course.cat.codes.to_numpy(np.int64) * 10_000
+        + df["duration_min"].to_numpy(np.int64)
+    )
+    labels = pa.array([f"{names[p // 10_000]} ({p % 10_000}')" for p in pairs.tolist()])
+    df["course_label"] = pd.array(labels.take(pair), dtype=pd.ArrowDtype(pa.string()))
+    df["n_students"] = df["n_students"].fillna(0)
+    return df.rename(columns=DETAIL_HEADERS), None
+
+
+def class_summary_frame(totals):
+    """Classi formate per tipologia: solfeggio per durata, poi prop/svil/fasce."""
+    solfeggio_classes = totals["solfeggio_class_count_by_duration"]
+    group_classes = totals["group_class_count"]
+    return arrow_frame(
+        {
+            "Tipologia Classe": [f"Solfeggio {d} min" for d in solfeggio_classes]
+            + [SPECIAL_LABELS[k] for k in group_classes],
+            "Numero classi": pa.array(
+                list(solfeggio_classes.values()) + list(group_classes.values()),
+                pa.int64(),
+            ),
+        }
+    )
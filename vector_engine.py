@@ -0,0 +1,476 @@
+"""Variante vettoriale (NumPy) del motore di calcolo.
+
+Iscritti e prezzi sono tensori densi durate × corsi (righe 30/45/60, colonne
+nell'ordine di `courses`), i corsi speciali vettori nell'ordine di SPECIAL_KEYS.
+Tutti gli argomenti di evaluate() accettano dimensioni iniziali aggiuntive
+(es. un asse "scenario"), quindi la stessa funzione valuta uno o molti scenari.
+
+I risultati coincidono bit per bit con engine.compute_totals: le somme sono
+fatte da sinistra a destra nello stesso ordine dei cicli Python (vedi
+sequential_sum) e ogni prodotto mantiene lo stesso ordine degli operandi.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from engine import (
+    DEFAULT_PRICES_BY_MIN,
+    DURATIONS,
+    GROUP_SPECIALS,
+    INDIVIDUAL_COURSES,
+    LESSONS_PER_PACKAGE,
+    SOLFEGGIO_COURSES,
+    SPECIAL_KEYS,
+    DetailRows,
+    annual_result,
+    courses,
+)
+
+COURSE_KEYS = tuple(key for key, _ in courses)
+DURATION_MINUTES = np.array(DURATIONS, dtype=float)
+
+# maschere sugli assi durate/corsi/speciali
+INDIVIDUAL_MASK = np.array([k in INDIVIDUAL_COURSES for k in COURSE_KEYS])
+SOLFEGGIO_MASK = np.array([k in SOLFEGGIO_COURSES for k in COURSE_KEYS])
+GROUP_MASK = np.array([k in GROUP_SPECIALS for k in SPECIAL_KEYS])
+SOLO_SOLFEGGIO = SPECIAL_KEYS.index("solo_solfeggio")
+SOLO_SOLFEGGIO_DURATION = DURATIONS.index(60)
+
+
+def sequential_sum(x):
+    """
+    Somma sull'ultimo asse da sinistra a destra, come sum() di Python:
+    np.sum usa la somma a coppie e può differire nell'ultimo bit.
+    """
+    if x.shape[-1] == 0:
+        return np.zeros(x.shape[:-1])
+    return np.cumsum(x, axis=-1)[..., -1]
+
+
+def class_count(students, min_students):
+    """ceil(studenti / minimo) per classe, 0 se non ci sono studenti."""
+    return np.where(students > 0, np.ceil(students / min_students), 0.0)
+
+
+# ----------------------------
+# CONVERSIONE DA/VERSO I DIZIONARI DELL'APP
+# ----------------------------
+def enrollment_tensor(enrolls):
+    """{(durata, corso): n} → array int (durate, corsi)."""
+    return np.array(
+        [[int(enrolls.get((d, k), 0)) for k in COURSE_KEYS] for d in DURATIONS],
+        dtype=np.int64,
+    )
+
+
+def price_tensor(price_overrides):
+    """{(durata, corso): prezzo} → array (durate, corsi), default per durata."""
+    return np.array(
+        [
+            [
+                float(price_overrides.get((d, k), DEFAULT_PRICES_BY_MIN[d]))
+                for k in COURSE_KEYS
+            ]
+            for d in DURATIONS
+        ]
+    )
+
+
+def special_vectors(specials, specials_data, defaults_specials=None):
+    """Restituisce (studenti, prezzi, durate) dei corsi speciali in ordine SPECIAL_KEYS."""
+    defaults_specials = defaults_specials or {}
+    students, prices, durations = [], [], []
+    for k in SPECIAL_KEYS:
+        meta = specials_data.get(k, {})
+        default = defaults_specials.get(k, {})
+        students.append(int(specials.get(k, 0)))
+        prices.append(float(meta.get("price", default.get("price", 0.0))))
+        durations.append(float(meta.get("duration", default.get("duration", 60))))
+    return (
+        np.array(students, dtype=np.int64),
+        np.array(prices),
+        np.array(durations),
+    )
+
+
+# ----------------------------
+# CALC
+# ----------------------------
+def evaluate(
+    enrollments,
+    prices,
+    special_students,
+    special_prices,
+    special_durations,
+    min_students,
+    hourly_teacher_cost,
+    total_available_hours,
+    num_lessons=LESSONS_PER_PACKAGE,
+):
+    """
+    Modello di costo su array. Forme: enrollments/prices (..., durate, corsi),
+    special_* (..., speciali), parametri scalari (...). Restituisce un dict di
+    array con le stesse chiavi numeriche di compute_totals più ricavi e costi per
+    riga (revenue_rows/cost_rows per durate × corsi, special_revenue/special_cost).
+    """
+    enrollments = np.asarray(enrollments)
+    special_students = np.asarray(special_students)
+    min_students = np.asarray(min_students, dtype=float)[..., None]
+    hourly = np.asarray(hourly_teacher_cost, dtype=float)
+    total_available_hours = np.asarray(total_available_hours, dtype=float)
+    lesson_ratio = num_lessons / LESSONS_PER_PACKAGE
+    batch_shape = np.broadcast_shapes(
+        enrollments.shape[:-2], special_students.shape[:-1], min_students.shape[:-1]
+    )
+
+    # RICAVI: corsi principali (durate × corsi) poi speciali con iscritti
+    revenue_rows = enrollments * np.asarray(prices) * lesson_ratio
+    special_revenue = np.where(
+        special_students > 0,
+        special_students * np.asarray(special_prices) * lesson_ratio,
+        0.0,
+    )
+    revenue_terms = np.concatenate(
+        [
+            np.broadcast_to(
+                revenue_rows, batch_shape + revenue_rows.shape[-2:]
+            ).reshape(batch_shape + (-1,)),
+            np.broadcast_to(special_revenue, batch_shape + special_revenue.shape[-1:]),
+        ],
+        axis=-1,
+    )
+    total_revenue = sequential_sum(revenue_terms)
+
+    # ORE individuali
+    individual_terms = (
+        enrollments * (DURATION_MINUTES / 60.0)[:, None] * num_lessons
+    ) * INDIVIDUAL_MASK
+    individual_hours = sequential_sum(
+        individual_terms.reshape(individual_terms.shape[:-2] + (-1,))
+    )
+
+    # SOLFEGGIO: studenti per durata, solo_solfeggio nel gruppo da 60'
+    solfeggio_students = (enrollments * SOLFEGGIO_MASK).sum(axis=-1)
+    solfeggio_students = np.broadcast_to(
+        solfeggio_students, batch_shape + (len(DURATIONS),)
+    ).copy()
+    solfeggio_students[..., SOLO_SOLFEGGIO_DURATION] += special_students[
+        ..., SOLO_SOLFEGGIO
+    ]
+    solfeggio_class_counts = class_count(solfeggio_students, min_students)
+    solfeggio_class_hours = sequential_sum(solfeggio_class_counts * 1.0 * num_lessons)
+
+    # ALTRI CORSI in classe (prop, svil, fasce)
+    group_class_counts = np.where(
+        GROUP_MASK, class_count(special_students, min_students), 0.0
+    )
+    group_week_terms = group_class_counts * (np.asarray(special_durations) / 60.0)
+    other_class_hours = sequential_sum(group_week_terms * num_lessons)
+
+    # ORE settimanali effettive (senza moltiplicare per num_lessons)
+    weekly_individual_hours = sequential_sum(
+        (enrollments * (DURATION_MINUTES / 60.0)[:, None] * INDIVIDUAL_MASK).reshape(
+            enrollments.shape[:-2] + (-1,)
+        )
+    )
+    weekly_solfeggio_hours = sequential_sum(solfeggio_class_counts * 1.0)
+    weekly_other_class_hours = sequential_sum(group_week_terms)
+    weekly_total_hours = (
+        weekly_individual_hours + weekly_solfeggio_hours + weekly_other_class_hours
+    )
+
+    total_hours = individual_hours + solfeggio_class_hours + other_class_hours
+    total_week_hours = (
+        total_hours / LESSONS_PER_PACKAGE if LESSONS_PER_PACKAGE else total_hours
+    )
+
+    # COSTI
+    individual_costs = hourly * individual_hours
+    special_costs = hourly * other_class_hours
+    teacher_cost = hourly * (individual_hours + other_class_hours)
+    solfeggio_cost = hourly * solfeggio_class_hours
+    total_costs = teacher_cost + solfeggio_cost
+    deviation = total_revenue - total_costs
+
+    # COSTI PER RIGA (come engine.allocated_hours): ore individuali, quota
+    # delle classi di solfeggio della durata, ore delle classi di gruppo
+    solfeggio_pool = solfeggio_class_counts * 1.0 * num_lessons
+    with np.errstate(divide="ignore", invalid="ignore"):
+        solfeggio_rows = (solfeggio_pool[..., None] * enrollments) / solfeggio_students[
+            ..., None
+        ]
+        solo_solfeggio_hours = (
+            solfeggio_pool[..., SOLO_SOLFEGGIO_DURATION]
+            * special_students[..., SOLO_SOLFEGGIO]
+        ) / solfeggio_students[..., SOLO_SOLFEGGIO_DURATION]
+    row_hours = individual_terms + np.where(
+        SOLFEGGIO_MASK & (solfeggio_students[..., None] > 0), solfeggio_rows, 0.0
+    )
+    special_hours = np.broadcast_to(
+        group_week_terms * num_lessons, batch_shape + (len(SPECIAL_KEYS),)
+    ).copy()
+    special_hours[..., SOLO_SOLFEGGIO] = np.where(
+        solfeggio_students[..., SOLO_SOLFEGGIO_DURATION] > 0, solo_solfeggio_hours, 0.0
+    )
+    cost_rows = hourly[..., None, None] * row_hours
+    special_cost = hourly[..., None] * special_hours
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturation = np.where(
+            total_available_hours > 0,
+            (total_week_hours / total_available_hours) * 100,
+            0.0,
+        )
+
+    return {
+        "total_revenue": total_revenue,
+        "total_hours": total_hours,
+        "total_week_hours": total_week_hours,
+        "saturation": saturation,
+        "individual_costs": individual_costs,
+        "special_costs": special_costs,
+        "solfeggio_cost": solfeggio_cost,
+        "total_costs": total_costs,
+        "deviation": deviation,
+        "revenue_rows": revenue_rows,
+        "special_revenue": special_revenue,
+        "cost_rows": cost_rows,
+        "special_cost": special_cost,
+        "solfeggio_students": solfeggio_students,
+        "solfeggio_class_counts": solfeggio_class_counts,
+        "group_class_counts": group_class_counts,
+        "individual_hours": individual_hours,
+        "solfeggio_class_hours": solfeggio_class_hours,
+        "other_class_hours": other_class_hours,
+        "teacher_cost": teacher_cost,
+        "weekly_individual_hours": weekly_individual_hours,
+        "weekly_solfeggio_hours": weekly_solfeggio_hours,
+        "weekly_other_class_hours": weekly_other_class_hours,
+        "weekly_total_hours": weekly_total_hours,
+    }
+
+
+def compute_totals_vec(
+    enrolls,
+    specials,
+    specials_data,
+    price_overrides,
+    min_students,
+    hourly_teacher_cost,
+    contributi,
+    costi_fissi,
+    total_available_hours,
+    num_lessons=LESSONS_PER_PACKAGE,
+    defaults_specials=None,
+):
+    """
+    Stessa firma e stesso risultato di engine.compute_totals, calcolato su array.
+    Gli iscritti devono coprire la griglia durate × corsi (come negli input dell'app).
+    """
+    special_students, special_prices, special_durations = special_vectors(
+        specials, specials_data, defaults_specials
+    )
+    enrollments = enrollment_tensor(enrolls)
+    prices = price_tensor(price_overrides)
+    res = evaluate(
+        enrollments,
+        prices,
+        special_students,
+        special_prices,
+        special_durations,
+        min_students,
+        hourly_teacher_cost,
+        total_available_hours,
+        num_lessons,
+    )
+
+    # righe di dettaglio colonnari: celle durate × corsi, poi speciali con iscritti
+    active = special_students > 0
+    detail_rows = DetailRows(
+        course_label=list(COURSE_KEYS) * len(DURATIONS)
+        + [k for k, a in zip(SPECIAL_KEYS, active) if a],
+        duration_min=np.repeat(DURATIONS, len(COURSE_KEYS)).tolist()
+        + special_durations[active].astype(int).tolist(),
+        n_students=enrollments.ravel().tolist() + special_students[active].tolist(),
+        price_per_10_lezioni=prices.ravel().tolist() + special_prices[active].tolist(),
+        revenue_for_package=res["revenue_rows"].ravel().tolist()
+        + res["special_revenue"][active].tolist(),
+    )
+    detail_rows.set_costs(
+        res["cost_rows"].ravel().tolist() + res["special_cost"][active].tolist()
+    )
+
+    totals = {
+        key: float(res[key])
+        for key in (
+            "total_revenue",
+            "total_hours",
+            "total_week_hours",
+            "saturation",
+            "individual_costs",
+            "special_costs",
+            "solfeggio_cost",
+            "total_costs",
+            "deviation",
+            "individual_hours",
+            "solfeggio_class_hours",
+            "other_class_hours",
+            "teacher_cost",
+            "weekly_individual_hours",
+            "weekly_solfeggio_hours",
+            "weekly_other_class_hours",
+            "weekly_total_hours",
+        )
+    }
+    totals["detail_rows"] = detail_rows
+    totals["solfeggio_class_count_by_duration"] = dict(
+        zip(DURATIONS, res["solfeggio_class_counts"].astype(int).tolist())
+    )
+    totals["solfeggio_students_by_duration"] = dict(
+        zip(DURATIONS, res["solfeggio_students"].tolist())
+    )
+    totals["group_class_count"] = {
+        k: int(n)
+        for k, n, group in zip(
+            SPECIAL_KEYS, res["group_class_counts"].tolist(), GROUP_MASK
+        )
+        if group
+    }
+    return totals
+
+
+# ----------------------------
+# SCENARI IN BLOCCO
+# ----------------------------
+SCENARIO_COLUMNS = (
+    "total_revenue",
+    "total_costs",
+    "deviation",
+    "saturation",
+    "annual_result",
+)
+
+
+def evaluate_scenarios(
+    enrollments,
+    prices,
+    min_students,
+    hourly_teacher_cost,
+    contributi=0.0,
+    costi_fissi=0.0,
+    special_students=None,
+    special_prices=None,
+    special_durations=None,
+    total_available_hours=150,
+    num_lessons=LESSONS_PER_PACKAGE,
+):
+    """
+    Valuta N scenari "what if" in un solo passaggio vettoriale.
+
+    enrollments/prices: (N, durate, corsi) oppure (durate, corsi) condivisi;
+    special_*: (N, speciali) oppure (speciali,), assenti = nessun corso speciale;
+    parametri scalari: (N,) oppure un numero valido per tutti gli scenari.
+    Restituisce un DataFrame con una riga per scenario e le colonne
+    SCENARIO_COLUMNS (annual_result = risultato netto dell'anno scolastico).
+    """
+    if special_students is None:
+        special_students = np.zeros(len(SPECIAL_KEYS), dtype=np.int64)
+    if special_prices is None:
+        special_prices = np.zeros(len(SPECIAL_KEYS))
+    if special_durations is None:
+        special_durations = np.full(len(SPECIAL_KEYS), 60.0)
+
+    res = evaluate(
+        enrollments,
+        prices,
+        special_students,
+        special_prices,
+        special_durations,
+        min_students,
+        hourly_teacher_cost,
+        total_available_hours,
+        num_lessons,
+    )
+    res["annual_result"] = annual_result(
+        res["total_revenue"],
+        res["total_costs"],
+        np.asarray(contributi, dtype=float),
+        np.asarray(costi_fissi, dtype=float),
+    )
+    shape = np.broadcast_shapes(*(np.shape(res[col]) for col in SCENARIO_COLUMNS))
+    return pd.DataFrame(
+        {col: np.broadcast_to(res[col], shape).ravel() for col in SCENARIO_COLUMNS}
+    )
+
+
+def stack_scenarios(scenarios):
+    """
+    Converte una lista di scenari nel formato di compute_totals (dict con
+    enrolls, specials, specials_data, price_overrides, min_students,
+    hourly_teacher_cost, contributi, costi_fissi, total_available_hours)
+    negli array di evaluate_scenarios.
+    """
+    specials = [
+        special_vectors(
+            s.get("specials", {}),
+            s.get("specials_data", {}),
+            s.get("defaults_specials"),
+        )
+        for s in scenarios
+    ]
+    return {
+        "enrollments": np.stack([enrollment_tensor(s["enrolls"]) for s in scenarios]),
+        "prices": np.stack(
+            [price_tensor(s.get("price_overrides", {})) for s in scenarios]
+        ),
+        "special_students": np.stack([sp[0] for sp in specials]),
+        "special_prices": np.stack([sp[1] for sp in specials]),
+        "special_durations": np.stack([sp[2] for sp in specials]),
+        **{
+            key: np.array([s.get(key, default) for s in scenarios], dtype=float)
+            for key, default in (
+                ("min_students", 6),
+                ("hourly_teacher_cost", 0.0),
+                ("contributi", 0.0),
+                ("costi_fissi", 0.0),
+                ("total_available_hours", 150),
+            )
+        },
+    }
+
+
+def scenario_fingerprint(batch):
+    """
+    Impronta SHA-256 degli array di uno o più scenari (chiave di cache).
+
+    Le funzioni con st.cache_data ricevono l'impronta e gli array come
+    `_batch`: il trattino basso esclude gli array dalla chiave, che è
+    l'impronta stessa, così Streamlit non li serializza a ogni chiamata.
+    """
+    digest = hashlib.sha256()
+    for key in sorted(batch):
+        value = np.ascontiguousarray(batch[key])
+        digest.update(f"{key}:{value.dtype}:{value.shape}".encode())
+        digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+def parameter_grid(batch, min_students_values, hourly_values):
+    """
+    Griglia min_students × costo docente per uno scenario (array di
+    stack_scenarios) in una sola valutazione: righe = min_students,
+    colonne = costo orario. Restituisce un dict colonna → array 2D.
+    """
+    min_students_values = np.asarray(min_students_values, dtype=float)
+    hourly_values = np.asarray(hourly_values, dtype=float)
+    table = evaluate_scenarios(
+        **dict(
+            batch,
+            min_students=min_students_values[:, None],
+            hourly_teacher_cost=hourly_values[None, :],
+        )
+    )
+    shape = (len(min_students_values), len(hourly_values))
+    return {col: table[col].to_numpy().reshape(shape) for col in SCENARIO_COLUMNS}